@@ -0,0 +1,261 @@
+"""
+Benchmarks for the overtime tracker on synthetic histories.
+
+Drives the app's real code paths offscreen and records, for each operation, the wall
+time and the peak memory allocated by Python while it runs. The results are written
+as JSON and compared with a stored baseline:
+
+    python benchmark.py                                  # 1k, 100k and 1M entries
+    python benchmark.py --sizes 1000 100000 --output results.json
+    python benchmark.py --save-baseline                  # accept the current numbers
+
+Exits with status 1 when an operation is slower or uses more memory than the
+baseline allows, so a regression fails loudly.
+"""
+import os
+
+# Must be set before Qt is loaded
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from datetime import date, datetime
+import argparse
+import gc
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PyQt6.QtCore import QThreadPool
+from PyQt6.QtWidgets import QApplication
+
+import config
+from cli import convert_entries
+from config import SALARY_FILE, open_entry_storage
+from entries import EntryStore, numpy
+from main import EntriesTableModel, OvertimeTrackerApp
+from storage import write_entries_file, write_json_atomic
+
+
+SIZES = [1000, 100000, 1000000]
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Single UI events are timed in batches of this many and reported per event
+EVENTS = 100
+
+# How much worse than the baseline an operation may get before it counts as a regression;
+# the absolute margins keep timer noise on sub-millisecond operations from failing runs
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.25
+MIN_TIME_DELTA = 0.001
+MIN_MEMORY_DELTA = 1024 * 1024
+
+TASKS = ['Client {} deployment', 'Fix bug #{}', 'Code review for project {}', 'Support ticket {}',
+         'Monthly report {}', 'Database migration {}', 'Meeting with team {}', 'Release {} hotfix']
+
+
+def synthetic_entries(count, seed=0):
+    """`count` entries spread over the last ten years, with a few hundred distinct tasks."""
+    rng = random.Random(seed)
+    first = date.today().toordinal() - 3650
+    tasks = [template.format(number) for template in TASKS for number in range(50)]
+    dates = [date.fromordinal(first + day).strftime('%d-%m-%Y') for day in range(3651)]
+    return [{'hours': rng.choice([0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 8.0]), 'date': rng.choice(dates),
+             'task': rng.choice(tasks)} for _ in range(count)]
+
+
+def prepare_data_dir(path, count, backend):
+    """Write a synthetic history and settings into `path`, in the format of `backend`."""
+    write_entries_file(os.path.join(path, config.OVERTIME_FILE), synthetic_entries(count))
+    write_json_atomic(os.path.join(path, SALARY_FILE),
+                      {'salary': 30000, 'multiplier': 1.5, 'report_dir': os.path.join(path, 'reports')})
+    if backend not in ('json', 'journal'):
+        convert_entries(path, backend, 'json')
+
+
+def measure(operation, events=1, setup=None):
+    """
+    Wall time per event (best of three runs) and peak traced memory of one more run.
+
+    Every run of `operation` must do `events` events' worth of work. `setup()`, if
+    given, runs untimed before each run.
+    """
+    times = []
+    for _ in range(3):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        operation()
+        times.append((time.perf_counter() - start) / events)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_bytes': peak}
+
+
+def run_size(count, backend):
+    """Time each operation of the app on a history of `count` entries."""
+    data_dir = tempfile.mkdtemp(prefix=f'overtime-bench-{count}-')
+    previous_dir = os.getcwd()
+    windows = []
+    try:
+        prepare_data_dir(data_dir, count, backend)
+        # The app keeps its data files in the working directory
+        os.chdir(data_dir)
+        rng = random.Random(count)
+        results = {}
+
+        def startup():
+            if windows:
+                windows.pop().close()
+            windows.append(OvertimeTrackerApp())
+
+        results['startup'] = measure(startup)
+        window = windows[-1]
+        model = window.overtime_model
+
+        def load_overtime_entries():
+            storage, window.storage = window.storage, open_entry_storage(scheduler=window.persist_scheduler)
+            try:
+                EntryStore(window.load_overtime_entries()[0])
+            finally:
+                window.storage.close()
+                window.storage = storage
+
+        results['load_overtime_entries'] = measure(load_overtime_entries)
+
+        def add_entries():
+            for entry in synthetic_entries(EVENTS, seed=rng.random()):
+                window.add_overtime_entry(entry)
+
+        results['add_entry'] = measure(add_entries, EVENTS)
+
+        def edit_cells(column, values):
+            def edit():
+                for _ in range(EVENTS):
+                    # setData validates the edit and hands it to handle_cell_changed
+                    model.setData(model.index(rng.randrange(len(window.overtime_entries)), column),
+                                  rng.choice(values))
+            return edit
+
+        hours_column = EntriesTableModel.FIELDS.index('hours')
+        date_column = EntriesTableModel.FIELDS.index('date')
+        dates = [window.overtime_entries.date(rng.randrange(len(window.overtime_entries))) for _ in range(50)]
+        results['handle_cell_changed.hours'] = measure(edit_cells(hours_column, ['1.25', '2.5', '6']), EVENTS)
+        results['handle_cell_changed.date'] = measure(edit_cells(date_column, dates), EVENTS)
+        results['update_overtime_table'] = measure(window.update_overtime_table)
+        results['update_info_label'] = measure(window.update_info_label)
+
+        def generate_report():
+            window.generate_report()
+            job = window.report_job
+            failures = []
+            # Wait for the worker instead of showing the "report saved" message box
+            job.signals.finished.disconnect()
+            job.signals.failed.disconnect()
+            job.signals.failed.connect(failures.append)
+            QThreadPool.globalInstance().waitForDone()
+            QApplication.processEvents()
+            window.end_report_job()
+            if failures:
+                raise RuntimeError(f'report failed: {failures[0]}')
+
+        def clear_reports():
+            # Without the monthly reports and their cache every month is written again
+            shutil.rmtree(window.profile_report_dir(), ignore_errors=True)
+
+        # Cold: every month written from scratch; warm: nothing changed, so every month is reused
+        results['generate_report.cold'] = measure(generate_report, setup=clear_reports)
+        results['generate_report.warm'] = measure(generate_report)
+        return results
+    finally:
+        for window in windows:
+            window.close()
+        os.chdir(previous_dir)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def compare(results, baseline, time_tolerance=TIME_TOLERANCE):
+    """Regressions of `results` against `baseline`, as printable lines."""
+    regressions = []
+    for size, operations in results.items():
+        for name, result in operations.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if (result['seconds'] > base['seconds'] * (1 + time_tolerance)
+                    and result['seconds'] - base['seconds'] > MIN_TIME_DELTA):
+                regressions.append(f'{size} entries, {name}: {result["seconds"] * 1000:.3f} ms '
+                                   f'(baseline {base["seconds"] * 1000:.3f} ms)')
+            if (result['peak_bytes'] > base['peak_bytes'] * (1 + MEMORY_TOLERANCE)
+                    and result['peak_bytes'] - base['peak_bytes'] > MIN_MEMORY_DELTA):
+                regressions.append(f'{size} entries, {name}: peak {result["peak_bytes"] / 2 ** 20:.1f} MiB '
+                                   f'(baseline {base["peak_bytes"] / 2 ** 20:.1f} MiB)')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the overtime tracker on synthetic histories.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='history sizes (default: %(default)s)')
+    parser.add_argument('--backend', choices=config.BACKENDS, default=config.STORAGE_BACKEND,
+                        help='storage backend to benchmark (default: %(default)s)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline to compare with (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TIME_TOLERANCE,
+                        help='allowed slowdown over the baseline, as a fraction (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    config.STORAGE_BACKEND = args.backend
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    results = {}
+    for count in args.sizes:
+        print(f'{count} entries...', file=sys.stderr)
+        results[str(count)] = run_size(count, args.backend)
+        for name, result in results[str(count)].items():
+            print(f'  {name:28} {result["seconds"] * 1000:10.3f} ms  {result["peak_bytes"] / 2 ** 20:8.1f} MiB',
+                  file=sys.stderr)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': args.backend,
+        'numpy': numpy is not None,
+        'results': results,
+    }
+    if args.output:
+        write_json_atomic(args.output, report)
+    if args.save_baseline:
+        write_json_atomic(args.baseline, report)
+        print(f'Baseline saved to {args.baseline}', file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one', file=sys.stderr)
+        return 0
+    with open(args.baseline, 'r') as file:
+        baseline = json.load(file)
+    if baseline.get('backend') != args.backend:
+        print(f'Baseline was taken with the {baseline.get("backend")} backend, not {args.backend}', file=sys.stderr)
+        return 1
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION: {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Headless command line for the overtime tracker.
+
+Uses the same storage and rate logic as the app without starting Qt:
+
+    python cli.py import timesheets/*.csv --data-dir team/alice
+    python cli.py report team/alice team/bob team/carol --month 2026-09 --output-dir reports/
+    python cli.py report team/alice --format parquet --output-dir exports/
+    python cli.py convert --to binary --data-dir team/alice
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+import argparse
+import csv
+import json
+import os
+import sys
+
+from config import (
+    BACKENDS, REPORT_DIR, STORAGE_BACKEND, days_in_month, open_entry_storage, read_settings, report_file_name
+)
+from entries import EntryStore, parse_non_negative
+from pay import PayEngine
+from reports import EXPORTERS, export_entries
+from storage import date_to_ordinal, normalize_dates
+
+
+def read_import_file(path):
+    """Entries from a CSV (hours,date,task[,multiplier] header) or JSON (list of entries) file, validated."""
+    with open(path, 'r', newline='') as file:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(file))
+        else:
+            rows = json.load(file)
+
+    entries = [{'hours': row['hours'], 'date': str(row['date']).strip(), 'task': str(row['task']).strip(),
+                'multiplier': row.get('multiplier') or 0} for row in rows]
+    normalize_dates(entries)
+    for number, entry in enumerate(entries, 1):
+        try:
+            entry['hours'] = parse_non_negative(entry['hours'])
+            entry['multiplier'] = parse_non_negative(entry['multiplier'], multiplier=True)
+            date_to_ordinal(entry['date'])
+            if not entry['task']:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f'{path}: entry {number} is invalid: {entry}')
+    return entries
+
+
+def import_entries(data_dir, paths, backend=None):
+    """Add all entries from `paths` to the data in `data_dir` as one batch; returns how many were added."""
+    new_entries = []
+    for path in paths:
+        new_entries.extend(read_import_file(path))
+
+    storage = open_entry_storage(data_dir, backend=backend)
+    try:
+        store = EntryStore(storage.load())
+        storage.attach(store)
+        store.extend(new_entries)
+        storage.add_many(new_entries)
+    finally:
+        storage.close()
+    return len(new_entries)
+
+
+def convert_entries(data_dir, target_backend, backend=None):
+    """Copy all entries of `data_dir` from one storage backend into another; returns how many were copied."""
+    source = open_entry_storage(data_dir, backend=backend)
+    try:
+        store = EntryStore(source.load())
+    finally:
+        source.close()
+
+    target = open_entry_storage(data_dir, backend=target_backend)
+    try:
+        target.load()
+        target.attach(store)
+        target.reset()
+        target.add_many(list(store.iter_dicts()))
+    finally:
+        target.close()
+    return len(store)
+
+
+def build_report(data_dir, output_dir, month=None, backend=None, export_format='xlsx'):
+    """
+    Write the report (xlsx, csv or parquet) for one data directory; runs in a worker process.
+
+    Returns (file name, rows).
+    """
+    settings = read_settings(data_dir)
+    pay = PayEngine(float(settings.get('salary', 0)), settings.get('multiplier', 1.0))
+    storage = open_entry_storage(data_dir, backend=backend)
+    try:
+        store = EntryStore(storage.load())
+    finally:
+        storage.close()
+
+    name = os.path.basename(os.path.abspath(data_dir))
+    if month is None:
+        entries = store
+    else:
+        year, month_number = month
+        start = date(year, month_number, 1)
+        end = date(year, month_number, days_in_month(year, month_number))
+        entries = store.between(start, end)
+        name = f'{name}-{year}-{month_number:02d}'
+
+    file_name = report_file_name(output_dir, name, export_format)
+    return file_name, export_entries(file_name, entries, pay)
+
+
+def parse_month(value):
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        date(year, month, 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected YYYY-MM, got {value!r}')
+    return year, month
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Overtime tracker without the GUI.')
+    parser.add_argument('--backend', choices=BACKENDS, default=STORAGE_BACKEND,
+                        help='storage backend of the data directories (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help='bulk-import entries from CSV or JSON files')
+    import_parser.add_argument('files', nargs='+',
+                               help='CSV files with an hours,date,task[,multiplier] header, or JSON lists')
+    import_parser.add_argument('--data-dir', default='', help='folder with the data files (default: current)')
+
+    report_parser = commands.add_parser('report', help='generate reports for many data directories at once')
+    report_parser.add_argument('data_dirs', nargs='+', help='folders with data files, one report each')
+    report_parser.add_argument('--output-dir', default=REPORT_DIR, help='where to save the reports')
+    report_parser.add_argument('--month', type=parse_month, help='only report this month (YYYY-MM)')
+    report_parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPUs)')
+    report_parser.add_argument('--format', choices=list(EXPORTERS), default='xlsx',
+                               help='file format (default: %(default)s; parquet needs pyarrow)')
+
+    convert_parser = commands.add_parser('convert', help='copy the entries into another storage backend')
+    convert_parser.add_argument('--to', required=True, choices=BACKENDS, help='backend to copy the entries into')
+    convert_parser.add_argument('--data-dir', default='', help='folder with the data files (default: current)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        try:
+            copied = convert_entries(args.data_dir, args.to, args.backend)
+        except (OSError, ValueError) as e:
+            print(f'Conversion failed: {e}', file=sys.stderr)
+            return 1
+        print(f'Copied {copied} entries from {args.backend} to {args.to}')
+        return 0
+
+    if args.command == 'import':
+        try:
+            added = import_entries(args.data_dir, args.files, args.backend)
+        except (OSError, KeyError, ValueError) as e:
+            print(f'Import failed, nothing was added: {e}', file=sys.stderr)
+            return 1
+        print(f'Imported {added} entries')
+        return 0
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        jobs = {pool.submit(build_report, data_dir, args.output_dir, args.month, args.backend, args.format): data_dir
+                for data_dir in args.data_dirs}
+        for job in as_completed(jobs):
+            try:
+                file_name, rows = job.result()
+            except Exception as e:
+                failed += 1
+                print(f'{jobs[job]}: failed: {e}', file=sys.stderr)
+            else:
+                print(f'{jobs[job]}: {rows} entries -> {file_name}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
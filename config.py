@@ -0,0 +1,132 @@
+from datetime import datetime
+from functools import lru_cache
+import calendar
+import json
+import os
+
+from storage import (
+    BinaryEntryStorage, JsonEntryStorage, JournalEntryStorage, ShardedEntryStorage, SqliteEntryStorage,
+    write_json_atomic
+)
+
+
+# Constants for file paths
+SALARY_FILE = 'salary_data.json'
+OVERTIME_FILE = 'overtime_data.json'
+JOURNAL_FILE = 'overtime_journal.jsonl'
+DATABASE_FILE = 'overtime_data.sqlite3'
+BINARY_FILE = 'overtime_data.bin'
+HEAP_FILE = 'overtime_data.heap'
+
+# How entries are persisted: 'journal' appends one record per change to JOURNAL_FILE and compacts
+# it into OVERTIME_FILE, 'json' rewrites OVERTIME_FILE on every change,
+# 'sqlite' keeps them in DATABASE_FILE (imported from the JSON files on first use),
+# 'binary' keeps them as fixed-width records in BINARY_FILE, memory-mapped, with task texts in HEAP_FILE
+# (convert existing data with `python cli.py convert --to binary`)
+STORAGE_BACKEND = 'journal'
+
+# Every backend open_entry_storage knows, for the command-line tools' --backend choices
+BACKENDS = ['json', 'journal', 'sqlite', 'binary']
+
+# Keep each year of entries in its own folder under years/ (see storage.ShardedEntryStorage), so the app
+# only reads the current year at startup; the binary backend keeps one file, as its record slots are entry ids
+SHARD_BY_YEAR = True
+
+# Profiles (one per employee or contract) each have their own salary, multiplier and entries: the default
+# profile keeps its files in the working directory, every other one in PROFILES_DIR/<name>.
+# PROFILES_FILE remembers the profile that was open last.
+PROFILES_DIR = 'profiles'
+PROFILES_FILE = 'profiles.json'
+DEFAULT_PROFILE = 'Default'
+
+# Quiet period (seconds) before salary, multiplier and JSON entry changes are written
+PERSIST_DELAY = 0.5
+
+# HTTP/JSON entry service (see server.py): where it listens, and the bearer token it requires, if any.
+# OVERTIME_SERVICE=1 starts it inside the app as well, on the open profile.
+SERVICE_HOST = os.environ.get('OVERTIME_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.environ.get('OVERTIME_SERVICE_PORT', 8765))
+SERVICE_TOKEN = os.environ.get('OVERTIME_SERVICE_TOKEN', '')
+SERVICE_IN_APP = os.environ.get('OVERTIME_SERVICE', '') not in ('', '0')
+
+# Where reports are saved unless a 'report_dir' is set in SALARY_FILE or given on the command line
+REPORT_DIR = os.environ.get('OVERTIME_REPORT_DIR', r"D:\Folder\Work\nvs\Overtime")
+
+
+def open_entry_storage(data_dir='', scheduler=None, backend=None):
+    """Create the configured entry storage for the data files in `data_dir` (default: working directory)."""
+    backend = backend or STORAGE_BACKEND
+    if SHARD_BY_YEAR and backend != 'binary':
+        legacy_paths = [os.path.join(data_dir, name)
+                        for name in (OVERTIME_FILE, JOURNAL_FILE, JOURNAL_FILE + '.sealed', DATABASE_FILE)]
+        return ShardedEntryStorage(data_dir, lambda shard_dir: open_year_storage(shard_dir, scheduler, backend),
+                                   legacy_paths, scheduler)
+    return open_year_storage(data_dir, scheduler, backend)
+
+
+def open_year_storage(data_dir, scheduler, backend):
+    """Storage of `backend` for the data files in `data_dir` itself (one year's folder when sharded)."""
+    overtime_file = os.path.join(data_dir, OVERTIME_FILE)
+    journal_file = os.path.join(data_dir, JOURNAL_FILE)
+    if backend == 'journal':
+        return JournalEntryStorage(overtime_file, journal_file)
+    if backend == 'sqlite':
+        return SqliteEntryStorage(os.path.join(data_dir, DATABASE_FILE), overtime_file, journal_file)
+    if backend == 'binary':
+        return BinaryEntryStorage(os.path.join(data_dir, BINARY_FILE), os.path.join(data_dir, HEAP_FILE))
+    return JsonEntryStorage(overtime_file, scheduler)
+
+
+def read_settings(data_dir=''):
+    """Salary, multiplier and other settings saved in `data_dir`'s SALARY_FILE."""
+    salary_file = os.path.join(data_dir, SALARY_FILE)
+    if os.path.exists(salary_file):
+        with open(salary_file, 'r') as file:
+            return json.load(file)
+    return {}
+
+
+def profile_dir(name):
+    """Folder with the data files of a profile."""
+    return '' if name == DEFAULT_PROFILE else os.path.join(PROFILES_DIR, name)
+
+
+def list_profiles():
+    names = []
+    if os.path.isdir(PROFILES_DIR):
+        names = sorted(entry.name for entry in os.scandir(PROFILES_DIR) if entry.is_dir())
+    return [DEFAULT_PROFILE] + [name for name in names if name != DEFAULT_PROFILE]
+
+
+def read_active_profile():
+    """Name of the profile that was open last (the default one if it no longer exists)."""
+    try:
+        with open(PROFILES_FILE, 'r') as file:
+            name = json.load(file).get('active', DEFAULT_PROFILE)
+    except (OSError, ValueError):
+        return DEFAULT_PROFILE
+    return name if name in list_profiles() else DEFAULT_PROFILE
+
+
+def write_active_profile(name):
+    write_json_atomic(PROFILES_FILE, {'active': name})
+
+
+@lru_cache(maxsize=None)
+def days_in_month(year, month):
+    return calendar.monthrange(year, month)[1]
+
+
+def hourly_rate(salary, year=None, month=None):
+    """Hourly rate for a monthly salary: a day's share of the month, over an 8-hour day (current month by default)."""
+    if year is None:
+        now = datetime.now()
+        year, month = now.year, now.month
+    return salary / days_in_month(year, month) / 8
+
+
+def report_file_name(report_dir, name=None, extension='xlsx'):
+    """Path of today's report in `report_dir`, creating the folder if needed."""
+    os.makedirs(report_dir, exist_ok=True)  # create folder if it doesn’t exist
+    prefix = f'overtime-report-{name}' if name else 'overtime-report'
+    return os.path.join(report_dir, f"{prefix}-{datetime.now().strftime('%d-%m-%Y')}.{extension}")
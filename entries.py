@@ -0,0 +1,663 @@
+from array import array
+from datetime import date, datetime, timedelta
+from itertools import compress
+import bisect
+import math
+import re
+
+from instrumentation import instrumented
+
+try:
+    import numpy
+except ImportError:  # optional; the columns work with plain arrays too
+    numpy = None
+
+
+# A history only spans a few thousand distinct days, so each date is parsed and formatted once
+_date_keys = {}
+_date_strings = {}
+
+
+def date_string_key(date_str):
+    """Integer sort key (date ordinal) for a DD-MM-YYYY date; unparseable dates sort first as 0."""
+    key = _date_keys.get(date_str)
+    if key is None:
+        try:
+            key = datetime.strptime(date_str, '%d-%m-%Y').toordinal()
+        except (TypeError, ValueError):
+            return 0
+        _date_keys[date_str] = key
+    return key
+
+
+def date_key(entry):
+    return date_string_key(entry['date'])
+
+
+def date_string_year(date_str):
+    """Year of a DD-MM-YYYY date; 0 for dates that could not be parsed."""
+    key = date_string_key(date_str)
+    return date.fromordinal(key).year if key else 0
+
+
+def parse_non_negative(value, multiplier=False):
+    """
+    A finite number >= 0 from text or a number, for hours and multipliers (which may be written
+    like x1.5 when `multiplier` is set); ValueError for anything else, including nan and inf,
+    which would poison the running totals for good.
+    """
+    try:
+        number = float(str(value).strip().lstrip('xX')) if multiplier else float(value)
+    except TypeError:
+        raise ValueError(f'expected a number, got {value!r}')
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f'expected a non-negative number, got {value!r}')
+    return number
+
+
+def month_start(ordinal):
+    """Ordinal of the first day of the month holding the date ordinal; 0 (undated) stays 0."""
+    return ordinal - date.fromordinal(ordinal).day + 1 if ordinal else 0
+
+
+def ordinal_date_string(ordinal):
+    date_str = _date_strings.get(ordinal)
+    if date_str is None:
+        date_str = _date_strings[ordinal] = date.fromordinal(ordinal).strftime('%d-%m-%Y')
+    return date_str
+
+
+class FenwickTree:
+    """Binary indexed tree over float values: point updates and prefix sums in O(log n)."""
+
+    def __init__(self, values):
+        # Linear-time build from the point values
+        self.size = len(values)
+        self.tree = [0.0] + list(values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, end):
+        """Sum of the values at positions [0, end)."""
+        total = 0.0
+        while end > 0:
+            total += self.tree[end]
+            end -= end & -end
+        return total
+
+
+class HoursIndex:
+    """
+    Hours per day, indexed by date ordinal with a Fenwick tree.
+
+    Any day, week, month or custom date range is answered in O(log n) without
+    looking at the entries. The covered span grows (and is rebuilt) when an entry
+    falls outside it, which only happens for dates far from the existing history.
+    """
+
+    def __init__(self, ordinals=(), hours=()):
+        day_hours = {}
+        for ordinal, value in zip(ordinals, hours):
+            if ordinal:
+                day_hours[ordinal] = day_hours.get(ordinal, 0.0) + value
+        self.build(day_hours, min(day_hours, default=date.today().toordinal()),
+                   max(day_hours, default=date.today().toordinal()))
+
+    def build(self, day_hours, first, last):
+        # Leave a year of room on both sides so new entries rarely force a rebuild
+        self.base = first - 366
+        size = last - first + 1 + 2 * 366
+        self.days = [0.0] * size
+        for ordinal, value in day_hours.items():
+            self.days[ordinal - self.base] = value
+        self.tree = FenwickTree(self.days)
+
+    def add(self, ordinal, hours):
+        if not ordinal:  # unparseable dates have no place on the timeline
+            return
+        if not self.base <= ordinal < self.base + len(self.days):
+            day_hours = {self.base + i: value for i, value in enumerate(self.days) if value}
+            day_hours[ordinal] = 0.0
+            self.build(day_hours, min(day_hours), max(day_hours))
+        self.days[ordinal - self.base] += hours
+        self.tree.add(ordinal - self.base, hours)
+
+    def hours_between(self, start, end):
+        """Hours logged on the date ordinals `start`..`end`, both inclusive."""
+        start = max(start - self.base, 0)
+        end = min(end - self.base + 1, len(self.days))
+        if end <= start:
+            return 0.0
+        return self.tree.prefix_sum(end) - self.tree.prefix_sum(start)
+
+
+def period_bounds(period, today=None):
+    """First and last date of a named rollup period ('this month', 'last quarter', ...) around `today`."""
+    today = today or date.today()
+    if period == 'today':
+        return today, today
+    if period == 'this week':
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6)
+    if period in ('this month', 'last month'):
+        start = today.replace(day=1)
+        if period == 'last month':
+            start = (start - timedelta(days=1)).replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    if period in ('this quarter', 'last quarter'):
+        quarter = (today.month - 1) // 3
+        year = today.year
+        if period == 'last quarter':
+            quarter -= 1
+            if quarter < 0:
+                quarter, year = 3, year - 1
+        start = date(year, quarter * 3 + 1, 1)
+        next_quarter = date(year + 1, 1, 1) if quarter == 3 else date(year, quarter * 3 + 4, 1)
+        return start, next_quarter - timedelta(days=1)
+    if period == 'this year':
+        return date(today.year, 1, 1), date(today.year, 12, 31)
+    raise ValueError(f'Unknown period: {period}')
+
+
+def task_words(text):
+    """Lower-cased words of a task description, as the search index sees them."""
+    return re.findall(r'\w+', text.lower())
+
+
+class TaskIndex:
+    """
+    Inverted index from words to the task codes whose text contains them.
+
+    Tasks are dictionary-encoded, so only a task text seen for the first time adds
+    postings; adding, editing or deleting entries with known tasks leaves the index
+    alone. Query words match word prefixes, so results appear while typing.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.words = []  # sorted, for prefix lookups
+
+    def add(self, code, text):
+        for word in task_words(text):
+            codes = self.postings.get(word)
+            if codes is None:
+                codes = self.postings[word] = set()
+                bisect.insort(self.words, word)
+            codes.add(code)
+
+    def codes_matching(self, query):
+        """Codes of the tasks containing a word starting with each word of `query`."""
+        result = None
+        for prefix in task_words(query):
+            first = bisect.bisect_left(self.words, prefix)
+            last = bisect.bisect_left(self.words, prefix + '\U0010ffff', first)
+            codes = set()
+            for word in self.words[first:last]:
+                codes |= self.postings[word]
+            result = codes if result is None else result & codes
+            if not result:
+                break
+        return result if result is not None else set()
+
+
+class EntryColumns:
+    """
+    Entries stored column by column instead of as one dict per entry.
+
+    `ids` (int64), `keys` (int32 date ordinals), `hours` and `multipliers` (float64) are
+    arrays, and tasks are dictionary-encoded: `task_codes` indexes into `task_values`, so
+    a task repeated over many entries is stored once. A row costs 32 bytes plus its task
+    string. Dates that could not be parsed have key 0 and keep their text in `odd_dates`.
+    A multiplier of 0 stands for the default multiplier (see pay.PayEngine).
+    Totals and filters run over whole columns, with numpy when it is installed.
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.keys = array('i')
+        self.hours = array('d')
+        self.multipliers = array('d')
+        self.task_codes = array('i')
+        self.task_values = []
+        self.odd_dates = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def date(self, row):
+        key = self.keys[row]
+        return ordinal_date_string(key) if key else self.odd_dates.get(self.ids[row], '')
+
+    def task(self, row):
+        return self.task_values[self.task_codes[row]]
+
+    def value(self, row, field):
+        if field == 'hours':
+            return self.hours[row]
+        if field == 'date':
+            return self.date(row)
+        if field == 'task':
+            return self.task(row)
+        if field == 'multiplier':
+            return self.multipliers[row]
+        if field == 'id':
+            return self.ids[row]
+        raise KeyError(field)
+
+    def entry(self, row):
+        return {'hours': self.hours[row], 'date': self.date(row), 'task': self.task(row),
+                'multiplier': self.multipliers[row], 'id': self.ids[row]}
+
+    def iter_rows(self, rows=None):
+        """(date, hours, task) tuples straight from the columns (or a contiguous `rows` range of them), for exports."""
+        task_values, odd_dates = self.task_values, self.odd_dates
+        columns = self.ids, self.keys, self.hours, self.task_codes
+        if rows is not None:
+            columns = [column[rows.start:rows.stop] for column in columns]
+        for entry_id, key, hours, code in zip(*columns):
+            yield (ordinal_date_string(key) if key else odd_dates.get(entry_id, '')), hours, task_values[code]
+
+    def iter_dicts(self):
+        for row in range(len(self.ids)):
+            yield self.entry(row)
+
+    def hours_array(self):
+        """The hours column as a numpy array sharing the same memory (numpy required)."""
+        return numpy.frombuffer(self.hours, dtype=numpy.float64)
+
+    def sum_hours(self, rows=None):
+        """Total of the hours column, or of the given rows of it."""
+        if isinstance(rows, range) and rows.step == 1:
+            # A date range is a contiguous slice of the column, no need to gather rows
+            if numpy is not None and len(self.hours):
+                return float(self.hours_array()[rows.start:rows.stop].sum())
+            return math.fsum(self.hours[rows.start:rows.stop])
+        if numpy is not None and len(self.hours):
+            hours = self.hours_array()
+            return float(hours.sum() if rows is None else hours[numpy.asarray(rows, dtype=numpy.intp)].sum())
+        if rows is None:
+            return math.fsum(self.hours)
+        hours = self.hours
+        return math.fsum(hours[row] for row in rows)
+
+    def month_sums(self, rows=None):
+        """
+        {first-day ordinal of a month (0 for undated): [hours at the default multiplier, sum of hours × multiplier]}
+
+        Over all rows or a contiguous `rows` range. The rows are in date order, so each
+        month is a slice found by bisecting the keys and summed as a whole.
+        """
+        rows = rows if rows is not None else range(len(self.ids))
+        keys = self.keys
+        sums = {}
+        row = rows.start
+        while row < rows.stop:
+            month = month_start(keys[row])
+            if month:
+                next_month = (date.fromordinal(month) + timedelta(days=32)).replace(day=1).toordinal()
+                end = bisect.bisect_left(keys, next_month, row, rows.stop)
+            else:
+                end = bisect.bisect_right(keys, 0, row, rows.stop)
+            if numpy is not None:
+                hours = self.hours_array()[row:end]
+                multipliers = numpy.frombuffer(self.multipliers, dtype=numpy.float64)[row:end]
+                sums[month] = [float(hours[multipliers == 0].sum()), float(numpy.dot(hours, multipliers))]
+            else:
+                pairs = list(zip(self.hours[row:end], self.multipliers[row:end]))
+                sums[month] = [math.fsum(hours for hours, multiplier in pairs if not multiplier),
+                               math.fsum(hours * multiplier for hours, multiplier in pairs)]
+            row = end
+        return sums
+
+    def rows_between(self, start, end):
+        """Range of rows dated `start`..`end` (dates, both inclusive), found by bisecting the keys."""
+        first = bisect.bisect_left(self.keys, start.toordinal())
+        last = bisect.bisect_right(self.keys, end.toordinal())
+        return range(first, last)
+
+    def select(self, start=None, end=None, min_hours=None, max_hours=None, task_codes=None):
+        """
+        Rows within a date range, an hours range and/or with one of `task_codes`, in date order.
+
+        A date range alone is returned as a range; otherwise the result is a numpy
+        array of row numbers when numpy is installed and a list when it is not.
+        """
+        rows = self.rows_between(start or date.min, end or date.max)
+        if min_hours is None and max_hours is None and task_codes is None:
+            return rows
+        low = -math.inf if min_hours is None else min_hours
+        high = math.inf if max_hours is None else max_hours
+        if numpy is not None:
+            mask = numpy.ones(len(rows), dtype=bool)
+            if min_hours is not None or max_hours is not None:
+                hours = self.hours_array()[rows.start:rows.stop]
+                mask &= (hours >= low) & (hours <= high)
+            if task_codes is not None:
+                # Look every row's code up in a table of wanted codes
+                wanted = numpy.zeros(len(self.task_values), dtype=bool)
+                wanted[list(task_codes)] = True
+                codes = numpy.frombuffer(self.task_codes, dtype=numpy.int32)[rows.start:rows.stop]
+                mask &= wanted[codes]
+            return numpy.flatnonzero(mask) + rows.start
+        if task_codes is not None:
+            wanted = frozenset(task_codes)
+            rows = list(compress(rows, map(wanted.__contains__, self.task_codes[rows.start:rows.stop])))
+        if min_hours is None and max_hours is None:
+            return rows
+        hours = self.hours
+        return [row for row in rows if low <= hours[row] <= high]
+
+    def copy_rows(self, rows=None):
+        """Independent EntryColumns holding a contiguous `rows` range (all rows by default)."""
+        rows = rows if rows is not None else range(len(self.ids))
+        start, stop = rows.start, rows.stop
+        copy = EntryColumns()
+        copy.ids = self.ids[start:stop]
+        copy.keys = self.keys[start:stop]
+        copy.hours = self.hours[start:stop]
+        copy.multipliers = self.multipliers[start:stop]
+        copy.task_codes = self.task_codes[start:stop]
+        copy.task_values = list(self.task_values)
+        copy.odd_dates = dict(self.odd_dates)
+        return copy
+
+
+class EntryStore(EntryColumns):
+    """
+    Overtime entries kept ordered by date, in columns.
+
+    Each entry's date is parsed once into the integer `keys` column. Adds and date
+    edits find their row with bisect, and the methods return the rows they touched
+    so a view can move a single row. The store hands out the entry ids.
+
+    The store also keeps the total hours, the hours per month (`month_totals`, see
+    month_sums) and an HoursIndex up to date as entries change, so totals, pay and
+    date-range rollups never walk the columns, and a TaskIndex over the task texts for search.
+
+    Years of entries may stay on disk (`unloaded`, see set_unloaded): their summaries
+    count in the total hours and month totals, and merge_year brings their rows in later.
+    """
+
+    def __init__(self, entries=()):
+        super().__init__()
+        self.task_lookup = {}
+        self.task_index = TaskIndex()
+        self.next_id = 0
+        self.unloaded = {}
+        self.load(entries)
+
+    @instrumented('sort_entries')
+    def load(self, entries):
+        """Replace the contents with `entries` (dicts, or an EntryColumns) and sort them once."""
+        if isinstance(entries, EntryColumns):
+            self.load_columns(entries)
+            return
+        entries = list(entries)
+        keys = [date_key(entry) for entry in entries]
+        order = sorted(range(len(keys)), key=keys.__getitem__)  # stable, like list.sort
+
+        EntryColumns.__init__(self)
+        self.task_lookup = {}
+        self.task_index = TaskIndex()
+        self.next_id = max((entry['id'] for entry in entries if 'id' in entry), default=-1) + 1
+        for i in order:
+            entry = entries[i]
+            self.append_columns(entry, keys[i])
+        self.rebuild_aggregates()
+
+    def load_columns(self, columns):
+        """Replace the contents with a copy of `columns`, sorted by date, without going through dicts."""
+        EntryColumns.__init__(self)
+        self.task_lookup = {}
+        self.task_index = TaskIndex()
+        codes = [self.encode_task(task) for task in columns.task_values]
+        if numpy is not None and len(columns.keys):
+            order = numpy.argsort(numpy.frombuffer(columns.keys, dtype=numpy.int32), kind='stable')
+            for name in ('ids', 'keys', 'hours', 'multipliers'):
+                column = getattr(columns, name)
+                getattr(self, name).frombytes(numpy.frombuffer(column, dtype=column.typecode)[order].tobytes())
+            task_codes = numpy.asarray(codes, dtype=numpy.int32)[numpy.frombuffer(columns.task_codes, dtype=numpy.int32)]
+            self.task_codes.frombytes(task_codes[order].tobytes())
+        else:
+            order = sorted(range(len(columns.keys)), key=columns.keys.__getitem__)
+            self.ids = array('q', map(columns.ids.__getitem__, order))
+            self.keys = array('i', map(columns.keys.__getitem__, order))
+            self.hours = array('d', map(columns.hours.__getitem__, order))
+            self.multipliers = array('d', map(columns.multipliers.__getitem__, order))
+            self.task_codes = array('i', (codes[columns.task_codes[i]] for i in order))
+        self.odd_dates = dict(columns.odd_dates)
+        self.next_id = max(self.ids, default=-1) + 1
+        self.rebuild_aggregates()
+
+    def rebuild_aggregates(self):
+        self.total_hours = self.sum_hours()
+        self.hours_index = HoursIndex(self.keys, self.hours)
+        self.month_totals = self.month_sums()
+        for summary in self.unloaded.values():
+            self.add_summary(summary, 1)
+
+    def add_summary(self, summary, sign):
+        """Count a year summary (see year_summary) in the total hours and month totals, or take it out (sign -1)."""
+        self.total_hours += sign * summary['hours']
+        for month, (default_hours, weighted_hours) in summary['months'].items():
+            totals = self.month_totals.setdefault(int(month), [0.0, 0.0])
+            totals[0] += sign * default_hours
+            totals[1] += sign * weighted_hours
+
+    def set_unloaded(self, summaries, next_id=0):
+        """
+        Count years whose entries are still on disk ({year: summary}) in the totals, until merge_year.
+
+        `next_id` is the next id free across all years, so new entries never reuse one of theirs.
+        """
+        self.unloaded = dict(summaries)
+        for summary in self.unloaded.values():
+            self.add_summary(summary, 1)
+        self.next_id = max(self.next_id, next_id)
+
+    def year_rows(self, year):
+        """Range of rows of one year (0: the undated entries); empty, at the year's place, when it has none."""
+        if not year:
+            return range(0, bisect.bisect_right(self.keys, 0))
+        return self.rows_between(date(year, 1, 1), date(year, 12, 31))
+
+    def year_summary(self, year):
+        """Entry count, hours and month sums (see month_sums) of one year, from the aggregates."""
+        rows = self.year_rows(year)
+        if year:
+            hours = self.hours_between(date(year, 1, 1), date(year, 12, 31))
+            months = [date(year, month, 1).toordinal() for month in range(1, 13)]
+        else:
+            hours, months = self.sum_hours(rows), [0]
+        return {'entries': len(rows), 'hours': hours,
+                'months': {month: list(self.month_totals[month]) for month in months if month in self.month_totals}}
+
+    @instrumented('merge_year')
+    def merge_year(self, year, entries):
+        """
+        Put the rows of a year that was on disk into place, replacing its summary in the totals.
+
+        `entries` is an EntryStore holding just that year; its rows go in as one block,
+        whose range is returned.
+        """
+        summary = self.unloaded.pop(year, None)
+        if summary is not None:
+            self.add_summary(summary, -1)
+        row = self.year_rows(year).start
+        codes = [self.encode_task(task) for task in entries.task_values]
+        self.ids[row:row] = entries.ids
+        self.keys[row:row] = entries.keys
+        self.hours[row:row] = entries.hours
+        self.multipliers[row:row] = entries.multipliers
+        self.task_codes[row:row] = array('i', map(codes.__getitem__, entries.task_codes))
+        self.odd_dates.update(entries.odd_dates)
+        self.next_id = max(self.next_id, entries.next_id)
+
+        self.total_hours += entries.total_hours
+        days = entries.hours_index.days
+        for offset in range(len(days)):
+            if days[offset]:
+                self.hours_index.add(entries.hours_index.base + offset, days[offset])
+        for month, (default_hours, weighted_hours) in entries.month_totals.items():
+            totals = self.month_totals.setdefault(month, [0.0, 0.0])
+            totals[0] += default_hours
+            totals[1] += weighted_hours
+        return range(row, row + len(entries))
+
+    def add_to_month(self, key, hours, multiplier):
+        """Count `hours` at `multiplier` in the month of `key` (negative hours take them out)."""
+        totals = self.month_totals.setdefault(month_start(key), [0.0, 0.0])
+        if multiplier:
+            totals[1] += hours * multiplier
+        else:
+            totals[0] += hours
+
+    def encode_task(self, task):
+        code = self.task_lookup.get(task)
+        if code is None:
+            code = self.task_lookup[task] = len(self.task_values)
+            self.task_values.append(task)
+            self.task_index.add(code, task)
+        return code
+
+    def assign_id(self, entry):
+        if 'id' not in entry:
+            entry['id'] = self.next_id
+        self.next_id = max(self.next_id, entry['id'] + 1)
+
+    def append_columns(self, entry, key):
+        self.assign_id(entry)
+        self.ids.append(entry['id'])
+        self.keys.append(key)
+        self.hours.append(entry['hours'])
+        self.multipliers.append(entry.get('multiplier', 0.0))
+        self.task_codes.append(self.encode_task(entry['task']))
+        if not key:
+            self.odd_dates[entry['id']] = entry['date']
+
+    def snapshot(self):
+        """Copy of the columns (plain memory copies) that later edits won't touch."""
+        return self.copy_rows()
+
+    def between(self, start, end):
+        """Snapshot of the entries dated `start`..`end` (dates, both inclusive)."""
+        return self.copy_rows(self.rows_between(start, end))
+
+    def insert_row(self, entry):
+        """Row an entry would be inserted at: after any entries with the same date."""
+        return bisect.bisect_right(self.keys, date_key(entry))
+
+    def insert(self, row, entry):
+        """Insert the entry (a dict) at `row`, giving it an 'id' if it has none."""
+        key = date_key(entry)
+        self.assign_id(entry)
+        self.ids.insert(row, entry['id'])
+        self.keys.insert(row, key)
+        self.hours.insert(row, entry['hours'])
+        self.multipliers.insert(row, entry.get('multiplier', 0.0))
+        self.task_codes.insert(row, self.encode_task(entry['task']))
+        if not key:
+            self.odd_dates[entry['id']] = entry['date']
+        self.total_hours += entry['hours']
+        self.hours_index.add(key, entry['hours'])
+        self.add_to_month(key, entry['hours'], self.multipliers[row])
+
+    def add(self, entry):
+        """Insert an entry at its sorted position and return its row."""
+        row = self.insert_row(entry)
+        self.insert(row, entry)
+        return row
+
+    def extend(self, entries):
+        """Add many entries at once; large batches are merged with one re-sort instead of bisecting each."""
+        entries = list(entries)
+        if len(entries) > len(self) // 16:
+            for entry in entries:
+                self.assign_id(entry)
+            self.load(list(self.iter_dicts()) + entries)
+        else:
+            for entry in entries:
+                self.add(entry)
+
+    def remove(self, row):
+        """Remove the entry at `row` and return it as a dict."""
+        entry = self.entry(row)
+        key = self.keys[row]
+        del self.ids[row], self.keys[row], self.hours[row], self.multipliers[row], self.task_codes[row]
+        self.odd_dates.pop(entry['id'], None)
+        self.total_hours -= entry['hours']
+        self.hours_index.add(key, -entry['hours'])
+        self.add_to_month(key, -entry['hours'], entry['multiplier'])
+        return entry
+
+    def relocate_row(self, row, date_str):
+        """Row the entry at `row` belongs at with the date `date_str`, counted with it removed."""
+        key = date_string_key(date_str)
+        if key == self.keys[row]:
+            return row
+        position = bisect.bisect_right(self.keys, key)
+        # Everything from `row` onwards shifts up by one once the entry is taken out
+        return position - 1 if position > row else position
+
+    def set_date(self, row, new_row, date_str):
+        """Give the entry at `row` the date `date_str` and move it to `new_row` (from relocate_row)."""
+        entry = self.remove(row)
+        entry['date'] = date_str
+        self.insert(new_row, entry)
+
+    def update(self, row, field, value):
+        """
+        Change one field of the entry at `row`, keeping the aggregates in step.
+
+        Returns the entry's row afterwards, which differs from `row` when a date
+        change moved it.
+        """
+        if field == 'hours':
+            delta = value - self.hours[row]
+            self.hours[row] = value
+            self.total_hours += delta
+            self.hours_index.add(self.keys[row], delta)
+            self.add_to_month(self.keys[row], delta, self.multipliers[row])
+        elif field == 'multiplier':
+            self.add_to_month(self.keys[row], -self.hours[row], self.multipliers[row])
+            self.multipliers[row] = value
+            self.add_to_month(self.keys[row], self.hours[row], value)
+        elif field == 'task':
+            self.task_codes[row] = self.encode_task(value)
+        elif field == 'date':
+            new_row = self.relocate_row(row, value)
+            self.set_date(row, new_row, value)
+            return new_row
+        else:
+            raise KeyError(field)
+        return row
+
+    def search(self, text='', start=None, end=None, min_hours=None, max_hours=None):
+        """Rows whose task matches every word of `text` (see TaskIndex), filtered like select()."""
+        task_codes = None
+        if task_words(text):
+            task_codes = self.task_index.codes_matching(text)
+            if not task_codes:
+                return []
+        return self.select(start, end, min_hours, max_hours, task_codes)
+
+    def row_of(self, entry_id, date_str=None):
+        """Current row of the entry with `entry_id`: a scan of the ids column, or of just the rows dated `date_str`."""
+        if date_str is None:
+            return self.ids.index(entry_id)
+        key = date_string_key(date_str)
+        first = bisect.bisect_left(self.keys, key)
+        return self.ids.index(entry_id, first, bisect.bisect_right(self.keys, key, first))
+
+    def hours_between(self, start, end):
+        """Hours logged from `start` to `end` (dates, both inclusive) in O(log n)."""
+        return self.hours_index.hours_between(start.toordinal(), end.toordinal())
@@ -0,0 +1,159 @@
+"""
+Opt-in timing of the app's hot paths, for attaching numbers to "it's slow" reports.
+
+Set OVERTIME_PROFILE=1 (or use the hidden diagnostics menu, Ctrl+Shift+D) to time every
+instrumented operation into a rolling histogram of its last SAMPLES calls.
+OVERTIME_PROFILE_CAPTURE=<operation>[,<operation>...] runs the next call of each named
+operation under cProfile and saves a .pstats file in OVERTIME_PROFILE_DIR (default: the
+working directory). While both are off, an instrumented call costs one flag check.
+"""
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+
+# Durations kept per operation
+SAMPLES = 1000
+
+# Upper bounds (seconds) of the histogram buckets; slower calls land in a last, open bucket
+BUCKETS = [0.0001, 0.001, 0.01, 0.1, 1.0]
+
+PROFILE_DIR = os.environ.get('OVERTIME_PROFILE_DIR', '')
+
+enabled = bool(os.environ.get('OVERTIME_PROFILE'))
+operations = set()
+histograms = {}
+captures = {}  # operation -> path of the .pstats file its next call is saved to
+lock = threading.Lock()
+
+
+class Histogram:
+    """The most recent durations of one operation, plus how many calls were seen overall."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=SAMPLES)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {'count': self.count}
+        buckets = [0] * (len(BUCKETS) + 1)
+        for seconds in samples:
+            index = next((i for i, bound in enumerate(BUCKETS) if seconds < bound), len(BUCKETS))
+            buckets[index] += 1
+        return {
+            'count': self.count,
+            'mean_ms': sum(samples) / len(samples) * 1000,
+            'p50_ms': samples[len(samples) // 2] * 1000,
+            'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            'max_ms': samples[-1] * 1000,
+            'buckets': dict(zip([f'<{bound * 1000:g} ms' for bound in BUCKETS] + [f'>={BUCKETS[-1] * 1000:g} ms'],
+                                buckets)),
+        }
+
+
+def set_enabled(value):
+    global enabled
+    enabled = bool(value)
+
+
+def record(operation, seconds):
+    with lock:
+        histogram = histograms.get(operation)
+        if histogram is None:
+            histogram = histograms[operation] = Histogram()
+        histogram.add(seconds)
+
+
+def capture_next(operation, path=None):
+    """Profile the next call of `operation` with cProfile and save the stats to `path`; returns the path."""
+    if path is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(PROFILE_DIR, f'profile-{operation}-{stamp}.pstats')
+    with lock:
+        captures[operation] = path
+    return path
+
+
+def run_instrumented(operation, function, args, kwargs):
+    with lock:
+        path = captures.pop(operation, None)
+    start = time.perf_counter()
+    try:
+        if path is None:
+            return function(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            profiler.dump_stats(path)
+            print(f'Saved profile of {operation} to {path}', file=sys.stderr)
+    finally:
+        if enabled:
+            record(operation, time.perf_counter() - start)
+
+
+def instrumented(operation):
+    """Decorator timing every call of the function as `operation` (while enabled)."""
+    operations.add(operation)
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled and not captures:
+                return function(*args, **kwargs)
+            return run_instrumented(operation, function, args, kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def timed(operation):
+    """Time the body of a `with` block as `operation`, e.g. one phase of a longer function."""
+    operations.add(operation)
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(operation, time.perf_counter() - start)
+
+
+def summaries():
+    with lock:
+        return {operation: histogram.summary() for operation, histogram in sorted(histograms.items())}
+
+
+def format_summaries():
+    """The timings as a plain-text table."""
+    lines = [f'{"operation":28} {"calls":>7} {"mean":>9} {"p50":>9} {"p95":>9} {"max":>9}  (ms)']
+    for operation, summary in summaries().items():
+        if 'mean_ms' in summary:
+            lines.append(f'{operation:28} {summary["count"]:7d} {summary["mean_ms"]:9.2f} {summary["p50_ms"]:9.2f} '
+                         f'{summary["p95_ms"]:9.2f} {summary["max_ms"]:9.2f}')
+    return '\n'.join(lines)
+
+
+def save_summaries(path):
+    with open(path, 'w') as file:
+        json.dump({'created': datetime.now().isoformat(timespec='seconds'), 'operations': summaries()}, file,
+                  indent=2)
+
+
+for name in os.environ.get('OVERTIME_PROFILE_CAPTURE', '').split(','):
+    if name.strip():
+        capture_next(name.strip())
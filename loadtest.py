@@ -0,0 +1,209 @@
+"""
+Load test for the entry service (server.py): many concurrent clients adding entries and asking for totals.
+
+Each client keeps one connection open and sends a mix of requests one after another.
+Prints the throughput and latency per kind of request, checks that every acknowledged
+entry was stored, and shows how many writes the service grouped into each commit:
+
+    python loadtest.py                                   # 200 clients against a fresh service
+    python loadtest.py --clients 500 --requests 100 --backend sqlite
+    python loadtest.py --url http://127.0.0.1:8765 --token s3cret   # a running service
+
+Without --url a headless service is started on a scratch data folder and stopped
+afterwards. Exits with status 1 when a request failed or an entry went missing.
+"""
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import BACKENDS
+
+
+CLIENTS = 200
+REQUESTS = 50
+
+# Share of each kind of request in a client's mix
+MIX = {'add': 0.5, 'totals': 0.3, 'query': 0.2}
+
+TASKS = ['Client {} deployment', 'Fix bug #{}', 'Support ticket {}', 'Release {} hotfix']
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, with just enough of the protocol for the service's answers."""
+
+    def __init__(self, host, port, token=''):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        head = f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n'
+        if self.token:
+            head += f'Authorization: Bearer {self.token}\r\n'
+        self.writer.write((head + '\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def random_entry(rng):
+    day = date.today() - timedelta(days=rng.randrange(365))
+    return {'hours': rng.choice([0.5, 1.0, 1.5, 2.0, 4.0]), 'date': day.strftime('%d-%m-%Y'),
+            'task': rng.choice(TASKS).format(rng.randrange(20))}
+
+
+async def run_client(host, port, token, requests, seed, latencies, errors):
+    """Send `requests` requests of the mix; returns how many entries the service acknowledged."""
+    rng = random.Random(seed)
+    connection = Connection(host, port, token)
+    added = 0
+    try:
+        for _ in range(requests):
+            kind = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+            start = time.perf_counter()
+            try:
+                if kind == 'add':
+                    status, _ = await connection.request('POST', '/entries', random_entry(rng))
+                elif kind == 'totals':
+                    status, _ = await connection.request('GET', '/totals')
+                else:
+                    status, _ = await connection.request('GET', f'/entries?text={rng.choice(TASKS).split()[0]}&limit=20')
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+                connection.close()
+                errors.append(f'{kind}: {type(e).__name__}: {e}')
+                continue
+            latencies[kind].append(time.perf_counter() - start)
+            if status >= 300:
+                errors.append(f'{kind}: HTTP {status}')
+            elif kind == 'add':
+                added += 1
+    finally:
+        connection.close()
+    return added
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def load_test(host, port, token, clients, requests):
+    status_connection = Connection(host, port, token)
+    _, before = await status_connection.request('GET', '/status')
+
+    latencies = {kind: [] for kind in MIX}
+    errors = []
+    start = time.perf_counter()
+    added = await asyncio.gather(*(run_client(host, port, token, requests, seed, latencies, errors)
+                                   for seed in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    _, after = await status_connection.request('GET', '/status')
+    status_connection.close()
+
+    done = sum(len(values) for values in latencies.values())
+    print(f'{clients} clients, {done} requests in {elapsed:.2f} s: {done / elapsed:.0f} requests/s')
+    for kind, values in latencies.items():
+        if values:
+            values.sort()
+            print(f'  {kind:7} {len(values):7}  p50 {percentile(values, 0.5) * 1000:7.1f} ms  '
+                  f'p95 {percentile(values, 0.95) * 1000:7.1f} ms  p99 {percentile(values, 0.99) * 1000:7.1f} ms  '
+                  f'max {values[-1] * 1000:7.1f} ms')
+    commits = after['commits'] - before['commits']
+    writes = after['committed_writes'] - before['committed_writes']
+    if commits:
+        print(f'  {writes} writes in {commits} commits ({writes / commits:.1f} per commit)')
+
+    failed = False
+    if errors:
+        print(f'{len(errors)} requests failed, e.g. {errors[0]}')
+        failed = True
+    if after['entries'] - before['entries'] != sum(added):
+        print(f'{sum(added)} entries were acknowledged, but the service holds '
+              f'{after["entries"] - before["entries"]} more than before')
+        failed = True
+    return 1 if failed else 0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_service(data_dir, port, backend):
+    """A headless service on `data_dir`, once it answers."""
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py'),
+               '--host', '127.0.0.1', '--port', str(port)]
+    if backend:
+        command += ['--backend', backend]
+    process = subprocess.Popen(command, cwd=data_dir)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'the service exited with status {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('the service did not start listening')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the entry service with many concurrent clients.')
+    parser.add_argument('--url', help='service to test, e.g. http://127.0.0.1:8765 (default: start one)')
+    parser.add_argument('--token', default=os.environ.get('OVERTIME_SERVICE_TOKEN', ''), help='bearer token')
+    parser.add_argument('--clients', type=int, default=CLIENTS, help='concurrent clients (default: %(default)s)')
+    parser.add_argument('--requests', type=int, default=REQUESTS, help='requests per client (default: %(default)s)')
+    parser.add_argument('--backend', choices=BACKENDS,
+                        help='storage backend of the started service (default: as configured)')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        url = urlsplit(args.url)
+        return asyncio.run(load_test(url.hostname, url.port or 80, args.token, args.clients, args.requests))
+
+    data_dir = tempfile.mkdtemp(prefix='overtime-loadtest-')
+    port = free_port()
+    process = start_service(data_dir, port, args.backend)
+    try:
+        return asyncio.run(load_test('127.0.0.1', port, '', args.clients, args.requests))
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,39 +1,459 @@
+import time
+
+# Taken before the heavy imports so the startup timing covers them too
+STARTUP_STARTED = time.perf_counter()
+
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QPushButton,
-    QDialog, QDateEdit, QTextEdit, QMessageBox, QTableWidget, QTableWidgetItem, QMenu, QLineEdit, QComboBox
+    QDialog, QDateEdit, QTextEdit, QMessageBox, QTableView, QHeaderView, QMenu, QLineEdit, QComboBox,
+    QProgressDialog, QFileDialog, QInputDialog
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QIntValidator
+from PyQt6.QtCore import (
+    Qt, QAbstractProxyModel, QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal,
+    pyqtSlot
+)
+from PyQt6.QtGui import QCursor, QDoubleValidator, QIntValidator, QKeySequence, QShortcut
 from datetime import datetime
+import bisect
+import html
 import sys
 import json
-import pandas as pd
 import os
-import calendar
+import threading
+
+from config import (
+    SALARY_FILE, PERSIST_DELAY, REPORT_DIR, SERVICE_HOST, SERVICE_IN_APP, SERVICE_PORT, SERVICE_TOKEN, list_profiles,
+    open_entry_storage, profile_dir, read_active_profile, read_settings, report_file_name, write_active_profile
+)
+from entries import EntryStore, date_string_year, parse_non_negative, period_bounds
+from instrumentation import instrumented
+import instrumentation
+from pay import PayEngine
+from reports import ReportCancelled, export_entries, parquet_available, write_monthly_reports
+from server import EntryCollection, EntryService, ServiceThread
+from storage import PersistScheduler, write_json_atomic
+
+
+# Periods offered by the rollup view below the totals
+ROLLUP_PERIODS = ['Today', 'This week', 'This month', 'Last month', 'This quarter', 'Last quarter',
+                  'This year', 'Custom range']
+
+# Date ranges offered by the table filter
+FILTER_PERIODS = ['All dates'] + ROLLUP_PERIODS
+
+
+class EntriesTableModel(QAbstractTableModel):
+    """Table model over the entry store; the view only asks for visible rows."""
+
+    HEADERS = ['Hours', 'Date', 'Task', 'Rate']
+    FIELDS = ['hours', 'date', 'task', 'multiplier']
+
+    # Emitted after a cell edit was validated and written into the entry
+    entry_edited = pyqtSignal(int, int)
+    # Emitted when an edit was rejected; the entry is left untouched
+    edit_rejected = pyqtSignal(int, int)
+
+    def __init__(self, entries, parent=None):
+        super().__init__(parent)
+        self.entries = entries
+        # year -> entries of a year still on disk (see EntryStore.unloaded); set by the app
+        self.year_loader = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            value = self.entries.value(index.row(), self.FIELDS[index.column()])
+            if self.FIELDS[index.column()] == 'multiplier':
+                # 0 stands for the default multiplier picked in the main window
+                return f'x{value:g}' if value else 'Default'
+            return str(value)
+        if role == Qt.ItemDataRole.TextAlignmentRole and index.column() != 2:
+            # Center-align the "Hours", "Date" and "Rate" columns, keep "Task" left-aligned
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return super().flags(index) | Qt.ItemFlag.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+
+        row, column = index.row(), index.column()
+        text = str(value).strip()
+        try:
+            if column == 0:  # Hours
+                new_value = parse_non_negative(text)
+            elif column == 1:  # Date
+                # validate DD-MM-YYYY
+                datetime.strptime(text, '%d-%m-%Y')
+                new_value = text
+            elif column == 3:  # Rate: x1.5, 1.5, or empty/Default for the default multiplier
+                new_value = 0.0 if text.lower() in ('', 'default') else parse_non_negative(text, multiplier=True)
+            else:  # Task
+                if not text:
+                    raise ValueError
+                new_value = text
+        except ValueError:
+            # Repaint just this cell with its old value
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole])
+            self.edit_rejected.emit(row, column)
+            return False
+
+        if new_value == self.entries.value(row, self.FIELDS[column]):
+            # Nothing to move or persist
+            return True
+
+        row = self.update_entry(row, self.FIELDS[column], new_value)
+        self.entry_edited.emit(row, column)
+        return True
+
+    def update_entry(self, row, field, value):
+        """Change one field of the entry at `row` (a checked value) and repaint it; returns its row afterwards."""
+        if field == 'date':  # Date changed, so move just this row to its new position
+            year = date_string_year(value)
+            if year in self.entries.unloaded:
+                # The entry joins a year that is still on disk, so that year comes in first
+                loaded = self.load_year(year)
+                if loaded.start <= row:
+                    row += len(loaded)
+            row = self.move_entry_to_date(row, value)
+        else:
+            self.entries.update(row, field, value)
+        index = self.index(row, self.FIELDS.index(field))
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole])
+        return row
+
+    def set_entries(self, entries):
+        """Swap in a new entry store, e.g. after loading or resetting data."""
+        self.beginResetModel()
+        self.entries = entries
+        self.endResetModel()
+
+    def insert_entry(self, entry):
+        """Insert an entry at its sorted position and return its row."""
+        row = self.entries.insert_row(entry)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.entries.insert(row, entry)
+        self.endInsertRows()
+        return row
+
+    @instrumented('load_year')
+    def load_year(self, year):
+        """Read a year that was still on disk and insert its entries as one block; returns their rows."""
+        year_entries = EntryStore(self.year_loader(year))
+        row = self.entries.year_rows(year).start
+        if not len(year_entries):
+            return self.entries.merge_year(year, year_entries)
+        self.beginInsertRows(QModelIndex(), row, row + len(year_entries) - 1)
+        rows = self.entries.merge_year(year, year_entries)
+        self.endInsertRows()
+        return rows
+
+    def remove_entry(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.entries.remove(row)
+        self.endRemoveRows()
+
+    def move_entry_to_date(self, row, date_str):
+        """Give one row a new date, moving just that row, and return where it ended up."""
+        new_row = self.entries.relocate_row(row, date_str)
+        if new_row == row:
+            self.entries.set_date(row, row, date_str)
+            return row
+        # Qt counts the destination in rows before the move
+        destination = new_row + 1 if new_row > row else new_row
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination)
+        self.entries.set_date(row, new_row, date_str)
+        self.endMoveRows()
+        return new_row
+
+
+class EntriesFilterModel(QAbstractProxyModel):
+    """
+    Shows only the entries matching the search box and filters.
+
+    Without a filter it passes the source model through and forwards its row-level
+    signals, so single-row adds, moves and edits stay cheap. With one, `rows` holds the
+    matching source rows (from the store's task index and columns), and adding,
+    moving or deleting entries runs the query again.
+    """
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.rows = None  # matching source rows in date order, None when nothing is filtered
+        self.query = {}
+        self.setSourceModel(source)
+        source.dataChanged.connect(self.source_data_changed)
+        source.rowsAboutToBeInserted.connect(self.source_rows_about_to_be_inserted)
+        source.rowsInserted.connect(self.source_rows_inserted)
+        source.rowsAboutToBeRemoved.connect(self.source_rows_about_to_be_removed)
+        source.rowsRemoved.connect(self.source_rows_removed)
+        source.rowsAboutToBeMoved.connect(self.source_rows_about_to_be_moved)
+        source.rowsMoved.connect(self.source_rows_moved)
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self.source_reset)
+
+    def is_filtered(self):
+        return self.rows is not None
+
+    def set_query(self, text='', start=None, end=None, min_hours=None, max_hours=None):
+        """Show the entries matching `text` and the ranges (see EntryStore.search); all when nothing is set."""
+        self.beginResetModel()
+        self.query = {key: value for key, value in
+                      dict(text=text.strip(), start=start, end=end, min_hours=min_hours, max_hours=max_hours).items()
+                      if value is not None and value != ''}
+        self.run_query()
+        self.endResetModel()
+
+    def run_query(self):
+        self.rows = self.sourceModel().entries.search(**self.query) if self.query else None
+
+    def total_hours(self):
+        """Hours of the shown entries."""
+        entries = self.sourceModel().entries
+        return entries.sum_hours(self.rows) if self.is_filtered() else entries.total_hours
+
+    def total_amount(self, pay):
+        """Pay for the shown entries, from `pay` (a PayEngine)."""
+        return pay.amount(self.sourceModel().entries, self.rows)
+
+    # Row changes in the source: forwarded one to one, or a new query when filtered
+
+    def source_rows_about_to_be_inserted(self, parent, first, last):
+        if self.is_filtered():
+            self.beginResetModel()
+        else:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def source_rows_inserted(self, parent, first, last):
+        if self.is_filtered():
+            self.source_reset()
+        else:
+            self.endInsertRows()
+
+    def source_rows_about_to_be_removed(self, parent, first, last):
+        if self.is_filtered():
+            self.beginResetModel()
+        else:
+            self.beginRemoveRows(QModelIndex(), first, last)
+
+    def source_rows_removed(self, parent, first, last):
+        if self.is_filtered():
+            self.source_reset()
+        else:
+            self.endRemoveRows()
+
+    def source_rows_about_to_be_moved(self, parent, first, last, destination_parent, destination):
+        if self.is_filtered():
+            self.beginResetModel()
+        else:
+            self.beginMoveRows(QModelIndex(), first, last, QModelIndex(), destination)
+
+    def source_rows_moved(self, parent, first, last, destination_parent, destination):
+        if self.is_filtered():
+            self.source_reset()
+        else:
+            self.endMoveRows()
+
+    def source_reset(self):
+        self.run_query()
+        self.endResetModel()
+
+    def source_data_changed(self, top_left, bottom_right, roles):
+        # An edited row stays visible until the next query, even if it no longer matches
+        top_left, bottom_right = self.mapFromSource(top_left), self.mapFromSource(bottom_right)
+        if top_left.isValid() and bottom_right.isValid():
+            self.dataChanged.emit(top_left, bottom_right, roles)
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not 0 <= row < self.rowCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows) if self.is_filtered() else self.sourceModel().rowCount()
+
+    def columnCount(self, parent=QModelIndex()):
+        return self.sourceModel().columnCount(parent)
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row()
+        if self.is_filtered():
+            row = int(self.rows[row])
+        return self.sourceModel().index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row()
+        if self.is_filtered():
+            # The matching rows are in date order, like the source
+            position = bisect.bisect_left(self.rows, row)
+            if position == len(self.rows) or self.rows[position] != row:
+                return QModelIndex()
+            row = position
+        return self.index(row, source_index.column())
+
+
+class ReportJobSignals(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class ReportJob(QRunnable):
+    """
+    Writes a report or export on a QThreadPool worker.
+
+    `write(progress, is_cancelled)` does the writing, from a snapshot of the entries.
+    """
+
+    def __init__(self, file_name, write):
+        super().__init__()
+        self.file_name = file_name
+        self.write = write
+        self.signals = ReportJobSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            self.write(self.signals.progress.emit, self.cancel_event.is_set)
+        except ReportCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(self.file_name)
+
+
+class MainThreadDispatcher(QObject):
+    """Runs functions handed over from other threads on the GUI thread, through a queued signal."""
+
+    call = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.call.connect(self.run)
+
+    @pyqtSlot(object)
+    def run(self, function):
+        function()
+
+
+class AppEntryCollection(EntryCollection):
+    """
+    The entry service's view of the app: changes go through the table model, so the
+    table and totals show them as they arrive, and always to the profile that is open.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @property
+    def store(self):
+        return self.app.overtime_entries
+
+    @property
+    def storage(self):
+        return self.app.storage
+
+    @property
+    def pay(self):
+        return self.app.pay
+
+    def load_year(self, year):
+        self.app.overtime_model.load_year(year)
 
+    def insert(self, entry):
+        return self.app.overtime_model.insert_entry(entry)
+
+    def remove(self, row):
+        self.app.overtime_model.remove_entry(row)
+
+    def set_value(self, row, field, value):
+        return self.app.overtime_model.update_entry(row, field, value)
+
+    def changed(self):
+        # The JSON storages only schedule their rewrites; have them on disk before the requests are answered
+        self.app.persist_scheduler.flush()
+        self.app.update_info_label()
 
-# Constants for file paths
-SALARY_FILE = 'salary_data.json'
-OVERTIME_FILE = 'overtime_data.json'
 
 class OvertimeTrackerApp(QWidget):
     def __init__(self):
         super().__init__()
 
-        # Load initial data
+        # Load initial data: only the active profile, and of its entries only the current year
+        self.persist_scheduler = PersistScheduler(PERSIST_DELAY)
+        self.open_profile(read_active_profile())
         self.salary = self.load_salary()
-        self.overtime_entries = self.load_overtime_entries()
-        self.overtime_entries.sort(key=lambda e: datetime.strptime(e['date'], '%d-%m-%Y'))
+
+        # Salary and default multiplier for the totals labels and reports; set by update_rates
+        self.pay = PayEngine()
+
+        # Report currently being written in the background, if any
+        self.report_job = None
+        self.report_progress = None
+
+        # Entry service for scripts and other machines, when enabled (see server.py)
+        self.service = None
+        self.service_thread = None
 
         # Initialize UI
         self.init_ui()
 
+        if SERVICE_IN_APP:
+            self.start_service()
+
     def init_ui(self):
         self.setWindowTitle('Overtime Tracker')
         layout = QVBoxLayout()
 
         self.setFixedWidth(340)
 
+        # Profile: whose salary, multiplier and entries are shown
+        profile_layout = QHBoxLayout()
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(list_profiles())
+        self.profile_combo.setCurrentText(self.profile)
+        self.profile_combo.currentTextChanged.connect(self.switch_profile)
+        new_profile_button = QPushButton('New...')
+        new_profile_button.clicked.connect(self.create_profile)
+        profile_layout.addWidget(QLabel('Profile:'))
+        profile_layout.addWidget(self.profile_combo, 1)
+        profile_layout.addWidget(new_profile_button)
+        layout.addLayout(profile_layout)
+
         # Salary Input and Real-Time Rate Calculations
         salary_layout = QHBoxLayout()
         self.salary_input = QLineEdit(str(self.salary))
@@ -45,7 +465,9 @@ class OvertimeTrackerApp(QWidget):
         # Overtime Rate Dropdown
         self.overtime_rate_combo = QComboBox()  # Initialize QComboBox
         self.overtime_rate_combo.addItems(['x1', 'x1.5', 'x2', 'x3'])
-        self.overtime_rate_combo.setCurrentIndex(0)  # Default to x1
+        # Restore the saved multiplier (x1 when none was saved)
+        saved_rate_index = self.overtime_rate_combo.findText(f'x{self.load_overtime_multiplier():g}')
+        self.overtime_rate_combo.setCurrentIndex(max(saved_rate_index, 0))
         self.overtime_rate_combo.currentIndexChanged.connect(self.update_rates)  # Update rates when changed
         salary_layout.addWidget(QLabel('Overtime Rate:'))
         salary_layout.addWidget(self.overtime_rate_combo)
@@ -92,23 +514,82 @@ class OvertimeTrackerApp(QWidget):
         layout.addWidget(reset_button)
 
         # Generate Report Button
-        generate_report_button = QPushButton('Generate Report')
-        generate_report_button.clicked.connect(self.generate_report)
-        layout.addWidget(generate_report_button)
+        self.generate_report_button = QPushButton('Generate Report')
+        self.generate_report_button.clicked.connect(self.generate_report)
+        layout.addWidget(self.generate_report_button)
+
+        # Export Button: CSV, or Parquet when pyarrow is installed
+        self.export_button = QPushButton('Export Entries...')
+        self.export_button.clicked.connect(self.export_report)
+        layout.addWidget(self.export_button)
 
         # Show Overtime Entries Table Button
         self.show_entries_button = QPushButton('▼ Show Overtime Entries')
         self.show_entries_button.clicked.connect(self.toggle_overtime_table)
         layout.addWidget(self.show_entries_button)
 
-        # Overtime Entries Table
-        self.overtime_table = QTableWidget()
-        self.overtime_table.setColumnCount(3)
-        self.overtime_table.setHorizontalHeaderLabels(['Hours', 'Date', 'Task'])
+        # Search and filters for the table, shown together with it
+        self.filter_widget = QWidget()
+        filter_layout = QVBoxLayout(self.filter_widget)
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('Search tasks...')
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.apply_filter)
+        filter_layout.addWidget(self.search_input)
+
+        filter_row_layout = QHBoxLayout()
+        self.filter_period_combo = QComboBox()
+        self.filter_period_combo.addItems(FILTER_PERIODS)
+        self.filter_period_combo.currentIndexChanged.connect(self.apply_filter)
+        self.min_hours_input = QLineEdit()
+        self.max_hours_input = QLineEdit()
+        for hours_input, placeholder in ((self.min_hours_input, 'min'), (self.max_hours_input, 'max')):
+            hours_input.setPlaceholderText(placeholder)
+            hours_input.setValidator(QDoubleValidator(0, 24, 2))
+            hours_input.textChanged.connect(self.apply_filter)
+        filter_row_layout.addWidget(self.filter_period_combo)
+        filter_row_layout.addWidget(QLabel('Hours:'))
+        filter_row_layout.addWidget(self.min_hours_input)
+        filter_row_layout.addWidget(self.max_hours_input)
+        filter_layout.addLayout(filter_row_layout)
+
+        # From/To dates, only shown for "Custom range"
+        self.filter_range_widget = QWidget()
+        filter_range_layout = QHBoxLayout(self.filter_range_widget)
+        filter_range_layout.setContentsMargins(0, 0, 0, 0)
+        self.filter_start_input = QDateEdit()
+        self.filter_end_input = QDateEdit()
+        for date_input in (self.filter_start_input, self.filter_end_input):
+            date_input.setCalendarPopup(True)
+            date_input.setDate(datetime.now())
+            date_input.setDisplayFormat('dd-MM-yyyy')
+            date_input.dateChanged.connect(self.apply_filter)
+        filter_range_layout.addWidget(QLabel('From:'))
+        filter_range_layout.addWidget(self.filter_start_input)
+        filter_range_layout.addWidget(QLabel('To:'))
+        filter_range_layout.addWidget(self.filter_end_input)
+        self.filter_range_widget.setVisible(False)
+        filter_layout.addWidget(self.filter_range_widget)
+        self.filter_widget.setVisible(False)
+        layout.addWidget(self.filter_widget)
+
+        # Overtime Entries Table (model/view, so only the visible rows are ever rendered)
+        self.overtime_model = EntriesTableModel(self.overtime_entries, self)
+        self.overtime_model.year_loader = lambda year: self.storage.load_year(year)
+        self.overtime_model.entry_edited.connect(self.handle_cell_changed)
+        self.overtime_model.edit_rejected.connect(self.handle_invalid_edit)
+        self.filter_model = EntriesFilterModel(self.overtime_model, self)
+        self.overtime_table = QTableView()
+        self.overtime_table.setModel(self.filter_model)
+        # Fixed row heights let the view skip measuring every row on large histories
+        self.overtime_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.overtime_table.setWordWrap(False)
         self.overtime_table.setVisible(False)
-        self.overtime_table.cellChanged.connect(self.handle_cell_changed)  # Connect cellChanged signal
         self.overtime_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.overtime_table.customContextMenuRequested.connect(self.show_context_menu)
+        # Earlier years are read when the table is scrolled to the top
+        self.overtime_table.verticalScrollBar().valueChanged.connect(self.table_scrolled)
         layout.addWidget(self.overtime_table)
 
         # Info Label for displaying totals
@@ -116,54 +597,145 @@ class OvertimeTrackerApp(QWidget):
         self.info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)  # Center the label
         layout.addWidget(self.info_label)
 
+        # Rollup view: hours, days and amount for a chosen date range
+        rollup_layout = QHBoxLayout()
+        self.rollup_combo = QComboBox()
+        self.rollup_combo.addItems(ROLLUP_PERIODS)
+        self.rollup_combo.setCurrentText('This month')
+        self.rollup_combo.currentIndexChanged.connect(self.update_rollup_label)
+        rollup_layout.addWidget(QLabel('Period:'))
+        rollup_layout.addWidget(self.rollup_combo)
+        layout.addLayout(rollup_layout)
+
+        # From/To dates, only shown for "Custom range"
+        self.rollup_range_widget = QWidget()
+        range_layout = QHBoxLayout(self.rollup_range_widget)
+        range_layout.setContentsMargins(0, 0, 0, 0)
+        self.rollup_start_input = QDateEdit()
+        self.rollup_end_input = QDateEdit()
+        for date_input in (self.rollup_start_input, self.rollup_end_input):
+            date_input.setCalendarPopup(True)
+            date_input.setDate(datetime.now())
+            date_input.setDisplayFormat('dd-MM-yyyy')
+            date_input.dateChanged.connect(self.update_rollup_label)
+        range_layout.addWidget(QLabel('From:'))
+        range_layout.addWidget(self.rollup_start_input)
+        range_layout.addWidget(QLabel('To:'))
+        range_layout.addWidget(self.rollup_end_input)
+        self.rollup_range_widget.setVisible(False)
+        layout.addWidget(self.rollup_range_widget)
+
+        self.rollup_label = QLabel('Hours = 0  |  Days: 0.00  |  Amount = 0.00')
+        self.rollup_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.rollup_label)
+
+        # Hidden diagnostics menu for timings and profiles (see instrumentation.py)
+        QShortcut(QKeySequence('Ctrl+Shift+D'), self, self.show_diagnostics_menu)
+
         self.update_overtime_table()
         self.setLayout(layout)
         self.update_rates()
 
+    def open_profile(self, name):
+        """Open the storage of profile `name` and load its recent entries; earlier years stay on disk."""
+        self.profile = name
+        self.data_dir = profile_dir(name)
+        # Read once; later changes update this dict and are written from it
+        self.settings = read_settings(self.data_dir)
+        self.storage = open_entry_storage(self.data_dir, scheduler=self.persist_scheduler)
+        entries, summaries, next_id = self.load_overtime_entries()
+        # The store sorts the loaded list once and keeps it ordered from then on
+        self.overtime_entries = EntryStore(entries)
+        self.overtime_entries.set_unloaded(summaries, next_id)
+        self.storage.attach(self.overtime_entries)
+
+    def switch_profile(self, name):
+        """Close the current profile and show `name` (picked in the profile box) instead."""
+        if not name or name == self.profile:
+            return
+        # Anything still waiting to be written belongs to the profile being closed
+        self.persist_scheduler.flush()
+        self.storage.close()
+        write_active_profile(name)
+        self.open_profile(name)
+
+        settings = self.settings
+        for widget in (self.salary_input, self.overtime_rate_combo):
+            widget.blockSignals(True)
+        self.salary = settings.get('salary', 0)
+        self.salary_input.setText(str(self.salary))
+        rate_index = self.overtime_rate_combo.findText(f'x{settings.get("multiplier", 1.0):g}')
+        self.overtime_rate_combo.setCurrentIndex(max(rate_index, 0))
+        for widget in (self.salary_input, self.overtime_rate_combo):
+            widget.blockSignals(False)
+
+        self.overtime_model.set_entries(self.overtime_entries)
+        self.apply_filter()
+        self.update_rates()
+
+    def create_profile(self):
+        name, accepted = QInputDialog.getText(self, 'New Profile', 'Name of the employee or contract:')
+        name = name.strip()
+        if not accepted or not name:
+            return
+        if name in list_profiles() or name.startswith('.') or '/' in name or os.sep in name:
+            QMessageBox.warning(self, 'Invalid Name', f'"{name}" is taken or cannot be used as a folder name.')
+            return
+        os.makedirs(profile_dir(name), exist_ok=True)
+        self.profile_combo.addItem(name)
+        self.profile_combo.setCurrentText(name)
+
     def load_salary(self):
-        if os.path.exists(SALARY_FILE):
-            with open(SALARY_FILE, 'r') as file:
-                return json.load(file).get('salary', 0)
-        return 0
+        return self.settings.get('salary', 0)
 
-    def save_salary(self, salary):
-        with open(SALARY_FILE, 'w') as file:
-            json.dump({'salary': salary}, file)
+    def load_overtime_multiplier(self):
+        return self.settings.get('multiplier', 1.0)
 
+    @instrumented('save_salary')
+    def save_salary(self, salary):
+        """Queue a write of the salary and multiplier; rapid changes end up as one write off the GUI thread."""
+        self.settings.update(salary=salary, multiplier=self.get_overtime_multiplier())
+        # A copy, so later changes don't reach a write that is already queued
+        settings = dict(self.settings)
+        salary_file = os.path.join(self.data_dir, SALARY_FILE)
+        self.persist_scheduler.schedule(salary_file, lambda: write_json_atomic(salary_file, settings))
+
+    @instrumented('load_overtime_entries')
     def load_overtime_entries(self):
-        if os.path.exists(OVERTIME_FILE):
-            with open(OVERTIME_FILE, 'r') as file:
-                entries = json.load(file)
-                # Ensure all dates are converted to the desired format
-                for entry in entries:
-                    try:
-                        # Attempt to parse dates in both formats
-                        entry['date'] = pd.to_datetime(entry['date'], dayfirst=True).strftime('%d-%m-%Y')
-                    except ValueError:
-                        # Skip or handle errors in date parsing
-                        pass
-                return entries
-        return []
+        """(entries, summaries of the years left on disk, next free id), see ShardedEntryStorage.load_recent."""
+        return self.storage.load_recent()
+
+    def load_years(self, start=None, end=None):
+        """Read the years between the dates `start` and `end` (all by default) that are still on disk."""
+        years = [year for year in self.overtime_entries.unloaded
+                 if (start is None or year >= start.year) and (end is None or year <= end.year)]
+        # Latest first, so each block goes in above the rows already shown
+        for year in sorted(years, reverse=True):
+            self.overtime_model.load_year(year)
+
+    def start_service(self):
+        """Serve the open profile's entries over HTTP/JSON; requests are carried out on the GUI thread."""
+        dispatcher = MainThreadDispatcher(self)
+        self.service = EntryService(AppEntryCollection(self), dispatcher.call.emit, SERVICE_TOKEN)
+        self.service_thread = ServiceThread(self.service, SERVICE_HOST, SERVICE_PORT)
+        self.service_thread.start()
+        self.service_thread.ready.wait()
+        if self.service_thread.error is not None:
+            QMessageBox.warning(self, 'Entry Service',
+                                f'Could not serve entries on {SERVICE_HOST}:{SERVICE_PORT}: {self.service_thread.error}')
+            self.service = self.service_thread = None
 
     def save_overtime_entries(self):
-        with open(OVERTIME_FILE, 'w') as file:
-            json.dump(self.overtime_entries, file)
+        self.storage.save()
 
     def update_rates(self):
         salary = float(self.salary_input.text() or 0)
         self.save_salary(salary)
 
-        # Get the current year and month
-        now = datetime.now()
-        current_year = now.year
-        current_month = now.month
-
-        # Get the number of days in the current month
-        days_in_month = calendar.monthrange(current_year, current_month)[1]
-
-        # Calculate daily and hourly rates
-        daily_rate = salary / days_in_month
-        hourly_rate = daily_rate / 8
+        # Every entry is paid at its own month's rate; the labels show the current month's
+        self.pay = PayEngine(salary, self.get_overtime_multiplier())
+        hourly_rate = self.pay.rate()
+        daily_rate = hourly_rate * 8
 
         # Update labels
         self.daily_rate_label.setText(f'Daily Rate: {daily_rate:.2f}')
@@ -177,75 +749,135 @@ class OvertimeTrackerApp(QWidget):
         multiplier_str = self.overtime_rate_combo.currentText().replace('x', '')
         return float(multiplier_str)
 
+    @instrumented('update_info_label')
     def update_info_label(self):
-        # Calculate total hours, days, and amount
-        total_hours = sum(entry['hours'] for entry in self.overtime_entries)
-        salary = float(self.salary_input.text() or 0)
-        now = datetime.now()
-        days_in_month = calendar.monthrange(now.year, now.month)[1]
-        daily_rate = salary / days_in_month
-        hourly_rate = daily_rate / 8
-        overtime_multiplier = self.get_overtime_multiplier()
+        # Total hours and hours per month are kept up to date by the entry store (or summed over
+        # the filtered rows), the pay engine by update_rates
+        if self.service is not None:
+            # Totals the service answered from before this change are out of date
+            self.service.invalidate()
+        total_hours = self.filter_model.total_hours()
         total_days = total_hours / 8
-        total_amount = total_hours * hourly_rate * overtime_multiplier
+        total_amount = self.filter_model.total_amount(self.pay)
 
         # Update the info label
-        self.info_label.setText(f'Hours = {total_hours}  |  Days: {total_days:.2f}  |  Amount = {total_amount:.2f}')
+        prefix = 'Filtered: ' if self.filter_model.is_filtered() else ''
+        self.info_label.setText(
+            f'{prefix}Hours = {total_hours:g}  |  Days: {total_days:.2f}  |  Amount = {total_amount:.2f}')
+        self.update_rollup_label()
+
+    # Connected to signals: pyqtSlot() keeps Qt from passing the signal's arguments through the timing wrapper
+    @pyqtSlot()
+    @instrumented('update_rollup_label')
+    def update_rollup_label(self):
+        """Show the totals for the selected period, answered from the store's date index."""
+        period = self.rollup_combo.currentText()
+        is_custom = period == 'Custom range'
+        self.rollup_range_widget.setVisible(is_custom)
+        if is_custom:
+            start = self.rollup_start_input.date().toPyDate()
+            end = self.rollup_end_input.date().toPyDate()
+        else:
+            start, end = period_bounds(period.lower())
+
+        self.load_years(start, end)
+        hours = self.overtime_entries.hours_between(start, end)
+        amount = self.pay.amount(self.overtime_entries, self.overtime_entries.rows_between(start, end))
+        self.rollup_label.setText(f'Hours = {hours:g}  |  Days: {hours / 8:.2f}  |  Amount = {amount:.2f}')
+
+    @pyqtSlot()
+    @instrumented('apply_filter')
+    def apply_filter(self):
+        """Show only the entries matching the search box, date range and hours range."""
+        period = self.filter_period_combo.currentText()
+        is_custom = period == 'Custom range'
+        self.filter_range_widget.setVisible(is_custom)
+        start = end = None
+        if is_custom:
+            start = self.filter_start_input.date().toPyDate()
+            end = self.filter_end_input.date().toPyDate()
+        elif period != 'All dates':
+            start, end = period_bounds(period.lower())
+
+        hours_range = []
+        for hours_input in (self.min_hours_input, self.max_hours_input):
+            try:
+                hours_range.append(float(hours_input.text()))
+            except ValueError:  # empty or still being typed
+                hours_range.append(None)
+
+        # A query has to see every year it could match
+        if self.search_input.text().strip() or start is not None or any(value is not None for value in hours_range):
+            self.load_years(start, end)
+        self.filter_model.set_query(self.search_input.text(), start, end, *hours_range)
+        self.update_info_label()
 
     def show_add_entry_dialog(self):
-        dialog = AddEntryDialog(self)
+        dialog = AddEntryDialog(self, self.overtime_rate_combo.currentText())
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.overtime_entries.append(dialog.get_entry())
-            self.overtime_entries.sort(key=lambda e: datetime.strptime(e['date'], '%d-%m-%Y'))
-            self.save_overtime_entries()
-            self.update_overtime_table()
+            self.add_overtime_entry(dialog.get_entry())
+
+    @instrumented('add_overtime_entry')
+    def add_overtime_entry(self, entry):
+        """Insert a new entry into the table at its date, persist it and refresh the totals."""
+        year = date_string_year(entry['date'])
+        if year in self.overtime_entries.unloaded:
+            self.overtime_model.load_year(year)
+        self.overtime_model.insert_entry(entry)
+        self.storage.add(entry)
+        self.update_info_label()
 
     def toggle_overtime_table(self):
         if self.overtime_table.isVisible():
             # Hide the table and reset its height to zero
             self.overtime_table.setVisible(False)
+            self.filter_widget.setVisible(False)
             self.overtime_table.setFixedHeight(0)  # Set height to 0 to shrink the layout
             self.show_entries_button.setText('▼ Show Overtime Entries')
         else:
             # Show the table and set a fixed height to expand
             self.overtime_table.setVisible(True)
+            self.filter_widget.setVisible(True)
             self.overtime_table.setFixedHeight(200)  # Adjust the height as needed
             self.show_entries_button.setText('▲ Hide Overtime Entries')
         self.adjustSize()  # Adjust the size of the window
+        if self.overtime_table.isVisible():
+            self.fill_overtime_table()
+
+    def fill_overtime_table(self):
+        """Read earlier years until the table has something to scroll through, then show the latest entries."""
+        scroll_bar = self.overtime_table.verticalScrollBar()
+        while self.overtime_entries.unloaded and not self.filter_model.is_filtered():
+            self.overtime_table.doItemsLayout()
+            if scroll_bar.maximum() > scroll_bar.minimum():
+                break
+            self.overtime_model.load_year(max(self.overtime_entries.unloaded))
+        self.overtime_table.scrollToBottom()
+
+    def table_scrolled(self, value):
+        """Scrolling to the top of the whole history brings in the year before it, keeping the shown rows in place."""
+        scroll_bar = self.overtime_table.verticalScrollBar()
+        if (value != scroll_bar.minimum() or not self.overtime_entries.unloaded
+                or self.filter_model.is_filtered() or not self.overtime_table.isVisible()):
+            return
+        rows = self.overtime_model.load_year(max(self.overtime_entries.unloaded))
+        self.overtime_table.doItemsLayout()
+        scroll_bar.setValue(value + len(rows))
 
+    @instrumented('handle_cell_changed')
     def handle_cell_changed(self, row, column):
-        """Persist edits made directly in the table."""
-        try:
-            item_text = self.overtime_table.item(row, column).text().strip()
-
-            if column == 0:  # Hours
-                new_hours = float(item_text)
-                if new_hours < 0:
-                    raise ValueError
-                self.overtime_entries[row]['hours'] = new_hours
-
-            elif column == 1:  # Date
-                # validate DD-MM-YYYY
-                datetime.strptime(item_text, '%d-%m-%Y')
-                self.overtime_entries[row]['date'] = item_text
-                self.overtime_entries.sort(key=lambda e: datetime.strptime(e['date'], '%d-%m-%Y'))
-
-            elif column == 2:  # Task
-                if not item_text:
-                    raise ValueError
-                self.overtime_entries[row]['task'] = item_text
-
-            # save and refresh
-            self.save_overtime_entries()
-            self.update_info_label()
-            self.update_overtime_table()  # ← add this line
+        """Persist edits made directly in the table; the model has already repainted (and moved) the row."""
+        field = EntriesTableModel.FIELDS[column]
+        self.storage.update(self.overtime_entries.ids[row], field, self.overtime_entries.value(row, field))
+        self.update_info_label()
 
-        except (ValueError, AttributeError):
-            QMessageBox.warning(self, 'Invalid Input',
-                                'Please enter:\n• a positive number for Hours\n'
-                                '• a valid date DD-MM-YYYY for Date\n'
-                                '• non-empty text for Task')
-            self.update_overtime_table()  # revert to previous values
+    def handle_invalid_edit(self, row, column):
+        """The model rejected an edit and kept the previous value."""
+        QMessageBox.warning(self, 'Invalid Input',
+                            'Please enter:\n• a positive number for Hours\n'
+                            '• a valid date DD-MM-YYYY for Date\n'
+                            '• non-empty text for Task\n'
+                            '• a multiplier such as x1.5, or Default, for Rate')
 
     def show_context_menu(self, position):
         """Show a context menu when right-clicking on a table row."""
@@ -260,7 +892,7 @@ class OvertimeTrackerApp(QWidget):
     # Add this method to the OvertimeTrackerApp class
     def delete_entry(self):
         """Delete the selected entry from the table and update all variables."""
-        current_row = self.overtime_table.currentRow()
+        current_row = self.filter_model.mapToSource(self.overtime_table.currentIndex()).row()
         if current_row >= 0:  # Ensure a row is selected
             # Confirm deletion with the user
             reply = QMessageBox.question(
@@ -272,144 +904,157 @@ class OvertimeTrackerApp(QWidget):
             )
 
             if reply == QMessageBox.StandardButton.Yes:
-                # Remove the entry from the in-memory list
-                del self.overtime_entries[current_row]
+                # Remove the entry from the in-memory list and its row from the table
+                entry_id = self.overtime_entries.ids[current_row]
+                self.overtime_model.remove_entry(current_row)
 
                 # Save updated data to the file
-                self.save_overtime_entries()
+                self.storage.delete(entry_id)
 
-                # Update the table and other related variables
-                self.update_overtime_table()
+                # Update the related variables
+                self.update_info_label()
 
-    # Replace the existing update_overtime_table() method with this updated version
+    @instrumented('update_overtime_table')
     def update_overtime_table(self):
-        """Update the table widget and refresh other related information."""
-        self.overtime_entries.sort(key=lambda e: datetime.strptime(e['date'], '%d-%m-%Y'))  # ← add this
-        self.overtime_table.blockSignals(True)  # Block signals to prevent recursive updates
-        self.overtime_table.setRowCount(len(self.overtime_entries))
-        for row, entry in enumerate(self.overtime_entries):
-            # Center-align the "Hours" column
-            hours_item = QTableWidgetItem(str(entry['hours']))
-            hours_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)  # Center-align text
-            self.overtime_table.setItem(row, 0, hours_item)
-
-            # Center-align the "Date" column
-            date_item = QTableWidgetItem(entry['date'])
-            date_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)  # Center-align text
-            self.overtime_table.setItem(row, 1, date_item)
-
-            # Keep the "Task" column left-aligned (default)
-            task_item = QTableWidgetItem(entry['task'])
-            self.overtime_table.setItem(row, 2, task_item)
-
-        self.overtime_table.blockSignals(False)  # Re-enable signals after updates
+        """Point the table model at the current entries and refresh other related information."""
+        self.overtime_model.set_entries(self.overtime_entries)
 
         # Update info label whenever the table is updated
         self.update_info_label()
 
+    @pyqtSlot()
+    @instrumented('generate_report')
     def generate_report(self):
         try:
-            salary = float(self.salary_input.text() or 0)
-            now = datetime.now()
-            days_in_month = calendar.monthrange(now.year, now.month)[1]
-            hourly_rate = (salary / days_in_month) / 8
-
-            # Create a DataFrame with the overtime entries
-            report_data = pd.DataFrame(self.overtime_entries)
+            # Reports cover every year
+            self.load_years()
 
             # If there are no entries, show a message
-            if report_data.empty:
+            if not len(self.overtime_entries):
                 QMessageBox.information(self, 'No Data', 'There are no overtime entries to generate a report.')
                 return
 
-            # Convert the 'date' column to day-month-year format
-            report_data['date'] = pd.to_datetime(report_data['date'], dayfirst=True).dt.strftime('%d-%m-%Y')
-            report_data.sort_values('date', inplace=True, ignore_index=True)
-
-            # Compute the total hours, days, and amount
-            total_hours = report_data['hours'].sum()
-            total_days = total_hours / 8
-            total_amount = total_hours * hourly_rate
-
-            # Define the filename with the desired day-month-year format
-            # Save to specified directory "D:\This PC\Work\nvs\Overtime"
-            # file_name = f"D:\\This PC\\Work\\nvs\\Overtime\\overtime-report-{datetime.now().strftime('%d-%m-%Y')}.xlsx"
-            report_dir = r"D:\Folder\Work\nvs\Overtime"
-            os.makedirs(report_dir, exist_ok=True)  # create folder if it doesn’t exist
-            file_name = os.path.join(
-                report_dir,
-                f"overtime-report-{datetime.now().strftime('%d-%m-%Y')}.xlsx"
-            )
+            # Define the filename with the desired day-month-year format, in the profile's report folder;
+            # it links to one report per month, of which only the changed months are written again
+            report_dir = self.profile_report_dir()
+            file_name = report_file_name(report_dir, self.profile)
 
-            # Use pandas to create a basic Excel file first
-            with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
-                # Save the DataFrame to Excel without the header
-                report_data[['date', 'hours', 'task']].to_excel(writer, index=False, startrow=1, header=False)
-
-                # Access the workbook and sheet
-                workbook = writer.book
-                sheet = writer.sheets['Sheet1']
-
-                # Set header titles manually
-                headers = ['Date', 'Hours', 'Task']
-                for col_num, header in enumerate(headers, 1):
-                    cell = sheet.cell(row=1, column=col_num)
-                    cell.value = header
-                    # Set header style
-                    cell.font = cell.font.copy(bold=True)
-                    cell.alignment = cell.alignment.copy(horizontal='center')
-
-                # Center align all cells and auto adjust column widths
-                for column in sheet.columns:
-                    max_length = max(len(str(cell.value)) for cell in column) + 2  # Add padding
-                    if column[0].column_letter == 'A':  # Make the first column ("Date") slightly wider
-                        max_length += 5  # Increase width more for the first column
-                    sheet.column_dimensions[column[0].column_letter].width = max_length
-                    for cell in column:
-                        cell.alignment = cell.alignment.copy(horizontal='center')
-
-                # Write the summary information below the data
-                summary_row = len(report_data) + 3
-                sheet.cell(row=summary_row, column=1).value = "Total Hours"
-                sheet.cell(row=summary_row, column=2).value = total_hours
-                sheet.cell(row=summary_row, column=3).value = ""
-
-                sheet.cell(row=summary_row + 1, column=1).value = "In Days"
-                sheet.cell(row=summary_row + 1, column=2).value = total_days
-                sheet.cell(row=summary_row + 1, column=3).value = ""
-
-                sheet.cell(row=summary_row + 2, column=1).value = "Total Amount"
-                sheet.cell(row=summary_row + 2, column=2).value = total_amount
-                sheet.cell(row=summary_row + 2, column=3).value = ""
-
-                # Bold and center align all summary cells
-                for row in range(summary_row, summary_row + 3):
-                    for col in range(1, 4):
-                        cell = sheet.cell(row=row, column=col)
-                        cell.alignment = cell.alignment.copy(horizontal='center')
-                        cell.font = cell.font.copy(bold=True)
-
-            # Inform the user that the report has been saved
-            QMessageBox.information(self, 'Report Generated', f'Report saved as {file_name}')
-
-            # Automatically open the generated Excel file
-            os.startfile(file_name)
+            # Build the report in the background from a snapshot, so entries stay editable meanwhile
+            snapshot = self.overtime_entries.snapshot()
+            pay = self.pay
+            self.start_report_job(file_name, len(snapshot), lambda progress, is_cancelled: write_monthly_reports(
+                file_name, report_dir, snapshot, pay, progress=progress, is_cancelled=is_cancelled))
 
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'An error occurred while generating the report: {str(e)}')
 
-    def get_data_file_path(self, filename):
-        """ Helper method to get the correct file path for data files, compatible with PyInstaller """
-        try:
-            if getattr(sys, 'frozen', False):  # Check if running as a PyInstaller executable
-                base_path = os.path.dirname(sys.executable)  # Directory of the executable
-            else:
-                base_path = os.path.dirname(os.path.abspath(__file__))  # Directory of the script
-            return os.path.join(base_path, filename)
+    @pyqtSlot()
+    @instrumented('export_report')
+    def export_report(self):
+        """Export all entries, with their amounts, to a CSV or Parquet file chosen by the user."""
+        self.load_years()
+        if not len(self.overtime_entries):
+            QMessageBox.information(self, 'No Data', 'There are no overtime entries to export.')
+            return
 
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Failed to get file path: {str(e)}')
-            return filename  # Fallback in case of an error
+        filters = ['CSV (*.csv)']
+        if parquet_available():
+            filters.append('Parquet (*.parquet)')
+        default_name = report_file_name(self.profile_report_dir(), self.profile, 'csv')
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, 'Export Entries', default_name, ';;'.join(filters))
+        if not file_name:
+            return
+        if not os.path.splitext(file_name)[1]:
+            file_name += '.parquet' if 'parquet' in selected_filter else '.csv'
+
+        snapshot = self.overtime_entries.snapshot()
+        pay = self.pay
+        self.start_report_job(file_name, len(snapshot), lambda progress, is_cancelled: export_entries(
+            file_name, snapshot, pay, progress=progress, is_cancelled=is_cancelled))
+
+    def profile_report_dir(self):
+        """The profile's own folder in the report folder, so profiles never overwrite or remove each other's reports."""
+        return os.path.join(self.settings.get('report_dir', REPORT_DIR), self.profile)
+
+    def start_report_job(self, file_name, total, write):
+        """Run `write(progress, is_cancelled)` on the thread pool, with a progress dialog for `total` rows."""
+        self.report_job = ReportJob(file_name, write)
+        self.report_job.signals.progress.connect(self.update_report_progress)
+        self.report_job.signals.finished.connect(self.report_finished)
+        self.report_job.signals.failed.connect(self.report_failed)
+        self.report_job.signals.cancelled.connect(self.report_cancelled)
+
+        self.report_progress = QProgressDialog('Generating report...', 'Cancel', 0, total, self)
+        self.report_progress.setWindowModality(Qt.WindowModality.NonModal)
+        self.report_progress.setMinimumDuration(500)  # Only show up for reports that take a while
+        self.report_progress.canceled.connect(self.report_job.cancel)
+
+        self.generate_report_button.setEnabled(False)
+        self.export_button.setEnabled(False)
+        QThreadPool.globalInstance().start(self.report_job)
+
+    def update_report_progress(self, done, total):
+        if self.report_progress is not None:
+            self.report_progress.setValue(done)
+
+    def end_report_job(self):
+        self.report_job = None
+        if self.report_progress is not None:
+            self.report_progress.canceled.disconnect()
+            self.report_progress.close()
+            self.report_progress = None
+        self.generate_report_button.setEnabled(True)
+        self.export_button.setEnabled(True)
+
+    def report_finished(self, file_name):
+        self.end_report_job()
+
+        # Inform the user that the report has been saved
+        QMessageBox.information(self, 'Report Generated', f'Report saved as {file_name}')
+
+        # Automatically open the generated Excel (or CSV) file; Parquet files are for other tools.
+        # os.startfile only exists on Windows, and an error escaping this slot would abort the app
+        if hasattr(os, 'startfile') and not file_name.endswith('.parquet'):
+            try:
+                os.startfile(file_name)
+            except OSError as e:
+                QMessageBox.warning(self, 'Open Report', f'The report was saved but could not be opened: {e}')
+
+    def report_failed(self, message):
+        self.end_report_job()
+        QMessageBox.critical(self, 'Error', f'An error occurred while generating the report: {message}')
+
+    def report_cancelled(self):
+        self.end_report_job()
+
+    def show_diagnostics_menu(self):
+        """Switch operation timings on or off, show or save them, or profile the next call of an operation."""
+        menu = QMenu(self)
+        timing_action = menu.addAction('Time Operations')
+        timing_action.setCheckable(True)
+        timing_action.setChecked(instrumentation.enabled)
+        timing_action.toggled.connect(instrumentation.set_enabled)
+        show_action = menu.addAction('Show Timings')
+        save_action = menu.addAction('Save Timings...')
+        profile_menu = menu.addMenu('Profile Next Call Of')
+        for operation in sorted(instrumentation.operations):
+            profile_menu.addAction(operation).setData(operation)
+
+        action = menu.exec(QCursor.pos())
+        if action is None or action == timing_action:
+            return
+        if action == show_action:
+            text = instrumentation.format_summaries()
+            if not instrumentation.summaries():
+                text = 'Nothing timed yet. Turn on "Time Operations" and use the app for a while.'
+            QMessageBox.information(self, 'Timings', f'<pre>{html.escape(text)}</pre>')
+        elif action == save_action:
+            path, _ = QFileDialog.getSaveFileName(self, 'Save Timings', 'overtime-timings.json', 'JSON (*.json)')
+            if path:
+                instrumentation.save_summaries(path)
+        else:
+            path = os.path.abspath(instrumentation.capture_next(action.data()))
+            QMessageBox.information(self, 'Profiling', f'The next {action.data()} will be profiled and saved to\n{path}')
 
     def reset_entries(self):
         try:
@@ -417,37 +1062,34 @@ class OvertimeTrackerApp(QWidget):
             reply = QMessageBox.question(
                 self,
                 'Reset Data',
-                'This will reset all data including salary and overtime entries. Do you want to proceed?',
+                f'This will reset all data of the {self.profile} profile including salary and overtime entries. '
+                'Do you want to proceed?',
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                 QMessageBox.StandardButton.No
             )
 
             if reply == QMessageBox.StandardButton.Yes:
-                # Get paths to data files using the helper function
-                salary_file_path = self.get_data_file_path(SALARY_FILE)
-                overtime_file_path = self.get_data_file_path(OVERTIME_FILE)
+                # The settings file of the active profile
+                salary_file_path = os.path.join(self.data_dir, SALARY_FILE)
 
-                # Clear the contents of the salary file
+                # Clear the contents of the salary file, and the settings kept from it
+                self.settings = {'salary': 0}
                 if os.path.exists(salary_file_path):
                     with open(salary_file_path, 'w') as file:
-                        json.dump({'salary': 0}, file)
-                # Clear the contents of the overtime file
-                if os.path.exists(overtime_file_path):
-                    with open(overtime_file_path, 'w') as file:
-                        json.dump([], file)
+                        json.dump(self.settings, file)
+                # Swap an empty store in under the table (and its filter), then clear the stored entries
+                self.overtime_entries = EntryStore()
+                self.overtime_model.set_entries(self.overtime_entries)
+                self.storage.attach(self.overtime_entries)
+                self.storage.reset()
 
                 # Reset in-memory data
                 self.salary = 0
                 self.salary_input.setText('0')
-                self.overtime_entries = []
 
                 # Reset overtime rate to x1
                 self.overtime_rate_combo.setCurrentIndex(0)  # Set to 'x1'
 
-                # Clear data in the overtime table
-                self.overtime_table.clearContents()
-                self.overtime_table.setRowCount(0)
-
                 # Reset info label to default values
                 self.info_label.setText('Total Hours = 0  |  Days: 0.0 |  Amount = 0.00')
 
@@ -462,12 +1104,24 @@ class OvertimeTrackerApp(QWidget):
             QMessageBox.critical(self, 'Error', f'An error occurred while resetting data: {str(e)}')
             print(f"Error during reset: {e}")  # Debugging statement
 
+    def closeEvent(self, event):
+        # Stop a running report, write out anything still waiting for its quiet period,
+        # then let a running journal compaction finish and close the journal file
+        if self.report_job is not None:
+            self.report_job.cancel()
+        QThreadPool.globalInstance().waitForDone()
+        if self.service_thread is not None:
+            self.service_thread.stop()
+        self.persist_scheduler.close()
+        self.storage.close()
+        super().closeEvent(event)
+
 
 class AddEntryDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, multiplier_text='x1'):
         super().__init__(parent)
         self.setWindowTitle('Add Overtime Entry')
-        self.setFixedSize(300, 250)
+        self.setFixedSize(300, 280)
 
         # Use QSpinBox for Overtime Hours input with up/down arrows
         self.hours_input = QSpinBox()
@@ -481,6 +1135,10 @@ class AddEntryDialog(QDialog):
         self.date_input.setDate(datetime.now())
         self.date_input.setDisplayFormat('dd-MM-yyyy')
         self.task_input = QTextEdit()
+        # Each entry keeps its own multiplier, starting from the one selected in the main window
+        self.multiplier_input = QComboBox()
+        self.multiplier_input.addItems(['x1', 'x1.5', 'x2', 'x3'])
+        self.multiplier_input.setCurrentText(multiplier_text)
 
         # Layouts for aligned input fields
         layout = QVBoxLayout()
@@ -497,6 +1155,12 @@ class AddEntryDialog(QDialog):
         date_layout.addWidget(self.date_input)
         layout.addLayout(date_layout)
 
+        # Multiplier Field with Label
+        multiplier_layout = QHBoxLayout()
+        multiplier_layout.addWidget(QLabel('Overtime Rate:'))
+        multiplier_layout.addWidget(self.multiplier_input)
+        layout.addLayout(multiplier_layout)
+
         # Task Description Field
         layout.addWidget(QLabel('Task Description:'))
         layout.addWidget(self.task_input)
@@ -527,11 +1191,21 @@ class AddEntryDialog(QDialog):
         return {
             'hours': float(self.hours_input.value()),  # Use .value() with QSpinBox
             'date': self.date_input.date().toString('dd-MM-yyyy'),
-            'task': self.task_input.toPlainText()
+            'task': self.task_input.toPlainText(),
+            'multiplier': float(self.multiplier_input.currentText().replace('x', ''))
         }
 
+def report_startup_time():
+    """Print the time from process start to the first shown window, when OVERTIME_STARTUP_TIMING is set."""
+    elapsed_ms = (time.perf_counter() - STARTUP_STARTED) * 1000
+    print(f'Time to first window: {elapsed_ms:.0f} ms', file=sys.stderr)
+
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = OvertimeTrackerApp()
     window.show()
+    if os.environ.get('OVERTIME_STARTUP_TIMING'):
+        # Runs once the event loop has painted the window
+        QTimer.singleShot(0, report_startup_time)
     sys.exit(app.exec())
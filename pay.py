@@ -0,0 +1,124 @@
+"""
+Overtime pay, computed one way for the totals bar, the rollups and the reports.
+
+An entry earns hours × its multiplier × the hourly rate of its own month (see
+config.hourly_rate), so a day in February pays more than one in March. Entries keep
+their own multiplier; 0 means the default multiplier chosen in the app, which is what
+entries from before per-entry multipliers have. Entries whose date could not be parsed
+are paid at the current month's rate.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+import math
+
+from config import hourly_rate
+from entries import month_start
+
+try:
+    import numpy
+except ImportError:  # optional; amounts are then computed row by row
+    numpy = None
+
+
+@lru_cache(maxsize=4096)
+def month_rate(salary, year, month):
+    """Hourly rate of `salary` in one month, memoized per (salary, year, month)."""
+    return hourly_rate(salary, year, month)
+
+
+class PayEngine:
+    """Rates and amounts for one salary and default multiplier."""
+
+    def __init__(self, salary=0.0, default_multiplier=1.0):
+        self.salary = float(salary)
+        self.default_multiplier = float(default_multiplier)
+
+    def rate(self, year=None, month=None):
+        """Hourly rate of a month (the current one by default)."""
+        if year is None:
+            today = date.today()
+            year, month = today.year, today.month
+        return month_rate(self.salary, year, month)
+
+    def month_rate(self, month):
+        """Hourly rate of the month starting at the date ordinal `month` (0: the current month)."""
+        if not month:
+            return self.rate()
+        day = date.fromordinal(month)
+        return month_rate(self.salary, day.year, day.month)
+
+    def multiplier(self, multiplier):
+        return multiplier or self.default_multiplier
+
+    def multipliers(self, entries, rows=None):
+        """Multiplier of each row (all rows or a contiguous range), with 0 replaced by the default, like amounts()."""
+        span = slice(None) if rows is None else slice(rows.start, rows.stop)
+        if numpy is not None:
+            multipliers = numpy.frombuffer(entries.multipliers, dtype=numpy.float64)[span]
+            return numpy.where(multipliers == 0, self.default_multiplier, multipliers)
+        return [multiplier or self.default_multiplier for multiplier in entries.multipliers[span]]
+
+    def amount(self, entries, rows=None):
+        """
+        Pay for all entries, or for the given rows (a range or row numbers as from select()).
+
+        An EntryStore answers for all entries from its month totals; a range of rows is
+        summed month by month; other row sets are summed from amounts().
+        """
+        if rows is None and hasattr(entries, 'month_totals'):
+            month_sums = entries.month_totals
+        elif rows is None or isinstance(rows, range):
+            month_sums = entries.month_sums(rows)
+        elif numpy is not None:
+            return float(self.amounts(entries, rows).sum())
+        else:
+            return math.fsum(self.amounts(entries, rows))
+        return math.fsum(self.month_rate(month) * (default_hours * self.default_multiplier + weighted_hours)
+                         for month, (default_hours, weighted_hours) in month_sums.items())
+
+    def month_table(self, first, last):
+        """First-day ordinals and rates of the months from the one holding `first` to the one holding `last`."""
+        starts = []
+        rates = []
+        day = date.fromordinal(month_start(first))
+        while day.toordinal() <= last:
+            starts.append(day.toordinal())
+            rates.append(month_rate(self.salary, day.year, day.month))
+            day = (day + timedelta(days=32)).replace(day=1)
+        return starts, rates
+
+    def amounts(self, entries, rows=None):
+        """
+        Pay of each row (all rows, a contiguous range, or row numbers), in one vectorized pass.
+
+        Returns a numpy array when numpy is installed and a list otherwise.
+        """
+        if rows is None:
+            rows = range(len(entries))
+        today = date.today().toordinal()
+        if numpy is not None:
+            if isinstance(rows, range):
+                select = slice(rows.start, rows.stop)
+            else:
+                select = numpy.asarray(rows, dtype=numpy.intp)
+            keys = numpy.frombuffer(entries.keys, dtype=numpy.int32)[select]
+            if not len(keys):
+                return numpy.zeros(0)
+            hours = entries.hours_array()[select]
+            multipliers = numpy.frombuffer(entries.multipliers, dtype=numpy.float64)[select]
+            multipliers = numpy.where(multipliers == 0, self.default_multiplier, multipliers)
+            keys = numpy.where(keys == 0, today, keys)
+            starts, rates = self.month_table(int(keys.min()), int(keys.max()))
+            month_index = numpy.searchsorted(numpy.asarray(starts), keys, side='right') - 1
+            return hours * multipliers * numpy.asarray(rates)[month_index]
+
+        keys, hours, multipliers = entries.keys, entries.hours, entries.multipliers
+        rates = {}  # key -> rate, as the same days come up again and again
+        amounts = []
+        for row in rows:
+            key = keys[row] or today
+            rate = rates.get(key)
+            if rate is None:
+                rate = rates[key] = self.month_rate(month_start(key))
+            amounts.append(hours[row] * self.multiplier(multipliers[row]) * rate)
+        return amounts
@@ -0,0 +1,389 @@
+from datetime import date
+import bisect
+import hashlib
+import importlib.util
+import json
+import os
+import struct
+
+from entries import ordinal_date_string
+from instrumentation import instrumented, timed
+from storage import write_json_atomic
+
+
+REPORT_HEADERS = ['Date', 'Hours', 'Task', 'Multiplier', 'Amount']
+SUMMARY_HEADERS = ['Month', 'Entries', 'Hours', 'Days', 'Amount', 'Report']
+
+# Monthly reports and their cache live in this folder inside the report folder
+MONTHS_DIR = 'months'
+CACHE_FILE = 'report_cache.json'
+
+# Rows written between two progress callbacks / cancellation checks
+PROGRESS_EVERY = 5000
+
+# Rows per chunk of a CSV export, and per row group of a Parquet export
+EXPORT_CHUNK = 100000
+
+# Date ordinal of 01-01-1970, where Parquet dates count from
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class ReportCancelled(Exception):
+    pass
+
+
+@instrumented('report')
+def write_xlsx_report(file_name, entries, pay, progress=None, is_cancelled=None, rows=None):
+    """
+    Stream the entries (an EntryColumns, e.g. a store snapshot) into an xlsx report with constant memory.
+
+    Every entry's amount and the total come from `pay` (a pay.PayEngine). `rows` limits
+    the report to a contiguous range of rows, e.g. one month.
+
+    Rows go straight to disk as they are written (xlsxwriter's constant_memory mode),
+    the three cell formats are created once for the whole workbook, and column
+    widths and total hours are measured in the same pass and applied at the end.
+
+    `progress(done, total)` is called every PROGRESS_EVERY rows. When `is_cancelled()`
+    returns True the partial file is removed and ReportCancelled is raised.
+    Returns the number of entry rows written.
+    """
+    # Only needed when a report is generated, so keep it out of startup
+    import xlsxwriter
+
+    total_rows = len(entries) if rows is None else len(rows)
+    multipliers = iter(pay.multipliers(entries, rows))
+    amounts = iter(pay.amounts(entries, rows))
+    workbook = xlsxwriter.Workbook(file_name, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet('Sheet1')
+        header_format = workbook.add_format({'bold': True, 'align': 'center'})
+        cell_format = workbook.add_format({'align': 'center'})
+        summary_format = workbook.add_format({'bold': True, 'align': 'center'})
+
+        # Set header titles
+        sheet.write_row(0, 0, REPORT_HEADERS, header_format)
+        widths = [len(header) for header in REPORT_HEADERS]
+
+        row = 0
+        total_hours = 0.0
+        with timed('report.rows'):
+            for row, ((date_str, hours, task), multiplier, amount) in enumerate(
+                    zip(entries.iter_rows(rows), multipliers, amounts), 1):
+                if row % PROGRESS_EVERY == 0:
+                    if is_cancelled is not None and is_cancelled():
+                        raise ReportCancelled
+                    if progress is not None:
+                        progress(row, total_rows)
+
+                total_hours += hours
+                sheet.write_string(row, 0, date_str, cell_format)
+                sheet.write_number(row, 1, hours, cell_format)
+                sheet.write_string(row, 2, task, cell_format)
+                sheet.write_number(row, 3, multiplier, cell_format)
+                sheet.write_number(row, 4, amount, cell_format)
+                widths[0] = max(widths[0], len(date_str))
+                widths[1] = max(widths[1], len(str(hours)))
+                widths[2] = max(widths[2], len(task))
+
+        # Write the summary information below the data, leaving one empty row
+        summary_row = row + 2
+        total_days = total_hours / 8
+        total_amount = pay.amount(entries, rows)
+        for offset, (label, value) in enumerate(
+                [('Total Hours', total_hours), ('In Days', total_days), ('Total Amount', total_amount)]):
+            sheet.write_string(summary_row + offset, 0, label, summary_format)
+            sheet.write_number(summary_row + offset, 1, value, summary_format)
+            for column in range(2, len(REPORT_HEADERS)):
+                sheet.write_blank(summary_row + offset, column, None, summary_format)
+
+        # Auto adjust column widths, with padding; make the "Date" column slightly wider
+        widths[3:] = [len(header) + 4 for header in REPORT_HEADERS[3:]]
+        for column, width in enumerate(widths):
+            sheet.set_column(column, column, width + 2 + (5 if column == 0 else 0))
+    except ReportCancelled:
+        workbook.close()
+        # Don't leave a half-written report behind
+        os.remove(file_name)
+        raise
+    except Exception:
+        workbook.close()
+        raise
+    # The xlsx file is assembled and compressed here
+    with timed('report.save'):
+        workbook.close()
+    if progress is not None:
+        progress(total_rows, total_rows)
+    return row
+
+
+def month_partitions(entries):
+    """
+    (label, year, month, rows) for every month with entries, in date order.
+
+    `rows` is the range of the month's rows, found by bisecting the date keys. Entries
+    whose date could not be parsed sort first and form an 'undated' partition.
+    """
+    keys = entries.keys
+    partitions = []
+    row = bisect.bisect_right(keys, 0)
+    if row:
+        partitions.append(('undated', None, None, range(0, row)))
+    while row < len(keys):
+        day = date.fromordinal(keys[row])
+        next_month = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+        end = bisect.bisect_left(keys, next_month.toordinal(), row)
+        partitions.append((f'{day.year}-{day.month:02d}', day.year, day.month, range(row, end)))
+        row = end
+    return partitions
+
+
+def month_hash(entries, rows, rate, default_multiplier):
+    """Hash of everything that ends up in a month's report: dates, hours, multipliers, tasks and the rate."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(struct.pack('<dd', rate, default_multiplier))
+    digest.update(entries.keys[rows.start:rows.stop].tobytes())
+    digest.update(entries.hours[rows.start:rows.stop].tobytes())
+    digest.update(entries.multipliers[rows.start:rows.stop].tobytes())
+    tasks = entries.task_values
+    digest.update('\0'.join(tasks[code] for code in entries.task_codes[rows.start:rows.stop]).encode('utf-8'))
+    if rows and not entries.keys[rows.start]:
+        # Undated rows all have key 0, so their date texts go in as well
+        digest.update('\0'.join(entries.date(row) for row in rows).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def read_report_cache(path):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+@instrumented('report.monthly')
+def write_monthly_reports(summary_file, report_dir, entries, pay, progress=None, is_cancelled=None):
+    """
+    Write one report per month into report_dir/MONTHS_DIR plus a summary workbook, reusing unchanged months.
+
+    Each month's report is cached with a hash of its content (see month_hash) and is
+    only written again when that hash changed or its file is missing; months that no
+    longer have entries are removed. Amounts come from `pay` (a pay.PayEngine).
+    `progress(done, total)` counts rows over all months, including reused ones.
+    Returns the number of months that were (re)written.
+    """
+    months_dir = os.path.join(report_dir, MONTHS_DIR)
+    os.makedirs(months_dir, exist_ok=True)
+    cache_path = os.path.join(months_dir, CACHE_FILE)
+    cache = read_report_cache(cache_path)
+
+    partitions = month_partitions(entries)
+    labels = {label for label, _, _, _ in partitions}
+    for label in set(cache) - labels:
+        month_file = os.path.join(months_dir, cache.pop(label)['file'])
+        if os.path.exists(month_file):
+            os.remove(month_file)
+
+    total_rows = len(entries)
+    done = 0
+    written = 0
+    try:
+        for label, year, month, rows in partitions:
+            if is_cancelled is not None and is_cancelled():
+                raise ReportCancelled
+            content_hash = month_hash(entries, rows, pay.rate(year, month), pay.default_multiplier)
+            file_name = f'overtime-report-{label}.xlsx'
+            cached = cache.get(label)
+            if (cached is None or cached['hash'] != content_hash
+                    or not os.path.exists(os.path.join(months_dir, file_name))):
+                month_progress = None
+                if progress is not None:
+                    month_progress = lambda month_done, month_total, base=done: progress(base + month_done, total_rows)
+                write_xlsx_report(os.path.join(months_dir, file_name), entries, pay,
+                                  progress=month_progress, is_cancelled=is_cancelled, rows=rows)
+                written += 1
+                cache[label] = {'hash': content_hash, 'file': file_name, 'entries': len(rows),
+                                'hours': entries.sum_hours(rows), 'amount': pay.amount(entries, rows)}
+            done += len(rows)
+            if progress is not None:
+                progress(done, total_rows)
+    finally:
+        # Months finished before a cancel or an error stay cached
+        write_json_atomic(cache_path, cache)
+
+    write_summary_report(summary_file, [(label, cache[label]) for label, _, _, _ in partitions])
+    return written
+
+
+def write_summary_report(file_name, months):
+    """One row per month (label, cached month info) with links to the monthly reports, then the totals."""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(file_name)
+    try:
+        sheet = workbook.add_worksheet('Summary')
+        header_format = workbook.add_format({'bold': True, 'align': 'center'})
+        cell_format = workbook.add_format({'align': 'center'})
+        summary_format = workbook.add_format({'bold': True, 'align': 'center'})
+        sheet.write_row(0, 0, SUMMARY_HEADERS, header_format)
+
+        total_entries = total_hours = total_amount = 0
+        for row, (label, month) in enumerate(months, 1):
+            sheet.write_string(row, 0, label, cell_format)
+            sheet.write_number(row, 1, month['entries'], cell_format)
+            sheet.write_number(row, 2, month['hours'], cell_format)
+            sheet.write_number(row, 3, month['hours'] / 8, cell_format)
+            sheet.write_number(row, 4, month['amount'], cell_format)
+            sheet.write_url(row, 5, f"external:{MONTHS_DIR}/{month['file']}", string=month['file'])
+            total_entries += month['entries']
+            total_hours += month['hours']
+            total_amount += month['amount']
+
+        total_row = len(months) + 2
+        for column, value in enumerate(['Total', total_entries, total_hours, total_hours / 8, total_amount]):
+            if column == 0:
+                sheet.write_string(total_row, column, value, summary_format)
+            else:
+                sheet.write_number(total_row, column, value, summary_format)
+        sheet.set_column(0, 4, 14)
+        sheet.set_column(5, 5, 32)
+    finally:
+        workbook.close()
+
+
+def export_chunks(entries, rows=None, chunk_rows=EXPORT_CHUNK):
+    """Split all rows, or a contiguous `rows` range, into ranges of at most `chunk_rows` rows."""
+    rows = rows if rows is not None else range(len(entries))
+    return [range(start, min(start + chunk_rows, rows.stop)) for start in range(rows.start, rows.stop, chunk_rows)]
+
+
+def plain_floats(values):
+    """Python floats from a numpy array (whose repr differs), or the list as it is."""
+    return values.tolist() if hasattr(values, 'tolist') else values
+
+
+def csv_field(text):
+    """`text` as csv.writer writes it: quoted only when it holds a comma, quote or line break."""
+    if any(character in text for character in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def iter_csv_chunks(entries, pay, rows=None, chunk_rows=EXPORT_CHUNK):
+    """
+    The entries as CSV text: a header line, then chunks of `chunk_rows` rows.
+
+    Columns are those of the xlsx report; amounts come from `pay` (a pay.PayEngine),
+    one chunk at a time, so memory stays bounded by the chunk size. Task texts are
+    dictionary-encoded in the store, so each is quoted once rather than once per row.
+    """
+    yield ','.join(REPORT_HEADERS) + '\n'
+    tasks = [csv_field(task) for task in entries.task_values]
+    odd_dates = entries.odd_dates
+    for chunk in export_chunks(entries, rows, chunk_rows):
+        span = slice(chunk.start, chunk.stop)
+        keys = entries.keys[span]
+        hours = entries.hours[span]
+        multipliers = plain_floats(pay.multipliers(entries, chunk))
+        # Dates, hours and multipliers repeat a lot, so each distinct one is formatted once
+        dates = {key: ordinal_date_string(key) if key else None for key in set(keys)}
+        numbers = {value: repr(value) for value in set(hours).union(multipliers)}
+        yield ''.join([
+            f'{dates[key] or csv_field(odd_dates.get(entry_id, ""))},{numbers[hours]},{tasks[code]},'
+            f'{numbers[multiplier]},{amount!r}\n'
+            for entry_id, key, hours, code, multiplier, amount in zip(
+                entries.ids[span], keys, hours, entries.task_codes[span], multipliers,
+                plain_floats(pay.amounts(entries, chunk)))
+        ])
+
+
+@instrumented('export.csv')
+def write_csv_report(file_name, entries, pay, progress=None, is_cancelled=None, rows=None):
+    """
+    Stream the entries into a CSV file, chunk by chunk (see iter_csv_chunks).
+
+    `progress` and `is_cancelled` work as in write_xlsx_report. Returns the number of entry rows written.
+    """
+    total_rows = len(entries) if rows is None else len(rows)
+    done = 0
+    try:
+        with open(file_name, 'w', newline='', encoding='utf-8') as file:
+            chunks = iter_csv_chunks(entries, pay, rows)
+            file.write(next(chunks))  # the header
+            for chunk in chunks:
+                if is_cancelled is not None and is_cancelled():
+                    raise ReportCancelled
+                file.write(chunk)
+                done = min(done + EXPORT_CHUNK, total_rows)
+                if progress is not None:
+                    progress(done, total_rows)
+    except ReportCancelled:
+        os.remove(file_name)
+        raise
+    return total_rows
+
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+@instrumented('export.parquet')
+def write_parquet_report(file_name, entries, pay, progress=None, is_cancelled=None, rows=None):
+    """
+    Write the entries to a Parquet file (pyarrow required), one row group per EXPORT_CHUNK rows.
+
+    Columns: date (a date, empty for dates that could not be parsed), hours, task
+    (dictionary-encoded, as in the store), multiplier and amount (from `pay`).
+    `progress` and `is_cancelled` work as in write_xlsx_report. Returns the number of entry rows written.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+
+    schema = pyarrow.schema([
+        ('date', pyarrow.date32()),
+        ('hours', pyarrow.float64()),
+        ('task', pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+        ('multiplier', pyarrow.float64()),
+        ('amount', pyarrow.float64()),
+    ])
+    tasks = pyarrow.array(entries.task_values, pyarrow.string())
+    total_rows = len(entries) if rows is None else len(rows)
+    done = 0
+    try:
+        with pyarrow.parquet.ParquetWriter(file_name, schema) as writer:
+            for chunk in export_chunks(entries, rows):
+                if is_cancelled is not None and is_cancelled():
+                    raise ReportCancelled
+                span = slice(chunk.start, chunk.stop)
+                days = pyarrow.array([key - EPOCH_ORDINAL if key else None for key in entries.keys[span]],
+                                     pyarrow.date32())
+                codes = pyarrow.array(entries.task_codes[span], pyarrow.int32())
+                writer.write_table(pyarrow.Table.from_arrays([
+                    days,
+                    pyarrow.array(entries.hours[span], pyarrow.float64()),
+                    pyarrow.DictionaryArray.from_arrays(codes, tasks),
+                    pyarrow.array(pay.multipliers(entries, chunk), pyarrow.float64()),
+                    pyarrow.array(pay.amounts(entries, chunk), pyarrow.float64()),
+                ], schema=schema))
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total_rows)
+    except ReportCancelled:
+        os.remove(file_name)
+        raise
+    return total_rows
+
+
+# Export formats by file extension
+EXPORTERS = {'xlsx': write_xlsx_report, 'csv': write_csv_report, 'parquet': write_parquet_report}
+
+
+def export_entries(file_name, entries, pay, progress=None, is_cancelled=None, rows=None):
+    """Write the entries in the format given by the extension of `file_name` (xlsx, csv or parquet)."""
+    extension = os.path.splitext(file_name)[1].lstrip('.').lower()
+    if extension not in EXPORTERS:
+        raise ValueError(f'Unknown export format: {file_name} (expected one of {", ".join(EXPORTERS)})')
+    return EXPORTERS[extension](file_name, entries, pay, progress=progress, is_cancelled=is_cancelled, rows=rows)
@@ -0,0 +1,505 @@
+"""
+HTTP/JSON service for submitting and querying overtime entries from scripts and other machines.
+
+Runs headless on a profile's data, or next to the app window (start the app with
+OVERTIME_SERVICE=1), where changes show up in the table as they arrive:
+
+    python server.py                                  # active profile, 127.0.0.1:8765
+    python server.py --profile Alice --host 0.0.0.0 --token s3cret
+
+Requests and answers are JSON:
+
+    POST   /entries          {"hours": 2, "date": "05-10-2026", "task": "Release", "multiplier": 1.5}
+                             (or a list of entries); answers the entries with their ids
+    GET    /entries          ?text=&start=&end=&min_hours=&max_hours=&offset=&limit=
+    GET    /entries/<id>
+    PATCH  /entries/<id>     {"hours": 3} (any of hours, date, task, multiplier)
+    DELETE /entries/<id>
+    GET    /totals           ?start=&end= (DD-MM-YYYY); hours, days and amount
+    GET    /status           entry count and how many writes went into how many commits
+
+Concurrent writes are group-committed: while one batch is being written, the next ones
+queue up and go to disk together in one storage batch (one journal fsync, one SQLite
+transaction, ...), and each request is answered once its change is on disk (in the app,
+the debounced JSON writes are flushed first). Totals come from the store's aggregates and
+are cached until the next change.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import asyncio
+import json
+import sys
+import threading
+
+from config import (
+    BACKENDS, SERVICE_HOST, SERVICE_PORT, SERVICE_TOKEN, list_profiles, open_entry_storage, profile_dir, read_active_profile,
+    read_settings
+)
+from entries import EntryStore, date_string_year, parse_non_negative
+from pay import PayEngine
+
+
+# Largest request body accepted, and most entries one query answers with
+MAX_BODY = 4 * 1024 * 1024
+MAX_LIMIT = 10000
+
+FIELDS = ('hours', 'date', 'task', 'multiplier')
+
+
+class RequestError(Exception):
+    """A request that cannot be served; answered with `status` and the message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_date(text, name):
+    try:
+        return datetime.strptime(text, '%d-%m-%Y').date()
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f'{name} must be a DD-MM-YYYY date, got {text!r}')
+
+
+def parse_number(value, name):
+    """A non-negative number (see entries.parse_non_negative); multipliers may be written like x1.5."""
+    try:
+        return parse_non_negative(value, multiplier=name == 'multiplier')
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f'{name} must be a non-negative number, got {value!r}')
+
+
+def validate_field(field, value):
+    """A field value from a request, checked and converted like the table checks cell edits."""
+    if field == 'date':
+        if not isinstance(value, str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f'date must be a DD-MM-YYYY string, got {value!r}')
+        return parse_date(value, 'date').strftime('%d-%m-%Y')
+    if field == 'task':
+        if not isinstance(value, str) or not value.strip():
+            raise RequestError(HTTPStatus.BAD_REQUEST, 'task must be non-empty text')
+        return value.strip()
+    if isinstance(value, bool):
+        # JSON true and false would otherwise pass as 1 and 0
+        raise RequestError(HTTPStatus.BAD_REQUEST, f'{field} must be a non-negative number, got {value!r}')
+    return parse_number(value, field)
+
+
+def validate_entry(data):
+    if not isinstance(data, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, 'an entry must be a JSON object')
+    missing = [field for field in ('hours', 'date', 'task') if field not in data]
+    if missing:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f'missing {", ".join(missing)}')
+    return {field: validate_field(field, data.get(field, 0.0)) for field in FIELDS}
+
+
+class EntryCollection:
+    """
+    The service's changes and queries, applied to one entry store and its storage.
+
+    Every method runs on the thread that owns the store. The app substitutes
+    AppEntryCollection, whose primitives go through its table model.
+    """
+
+    def __init__(self, store, storage, pay):
+        self.store = store
+        self.storage = storage
+        self.pay = pay
+
+    # Primitives
+
+    def load_year(self, year):
+        self.store.merge_year(year, EntryStore(self.storage.load_year(year)))
+
+    def insert(self, entry):
+        return self.store.add(entry)
+
+    def remove(self, row):
+        self.store.remove(row)
+
+    def set_value(self, row, field, value):
+        return self.store.update(row, field, value)
+
+    def changed(self):
+        """Called after each commit."""
+
+    # Requests
+
+    def load_years(self, start=None, end=None):
+        """Read the years between the dates `start` and `end` (all by default) that are still on disk."""
+        years = [year for year in self.store.unloaded
+                 if (start is None or year >= start.year) and (end is None or year <= end.year)]
+        for year in sorted(years, reverse=True):
+            self.load_year(year)
+
+    def find_row(self, entry_id):
+        try:
+            return self.store.row_of(entry_id)
+        except ValueError:
+            pass
+        # Ids are not tied to a year, so an id from an earlier session may be in any of them
+        if self.store.unloaded:
+            self.load_years()
+            return self.find_row(entry_id)
+        raise KeyError(entry_id)
+
+    def commit(self, operations):
+        """Run a batch of changes and persist them together; returns (result, error) per change."""
+        results = []
+        with self.storage.batch():
+            for operation in operations:
+                try:
+                    results.append((operation(self), None))
+                except (KeyError, RequestError) as e:
+                    results.append((None, e))
+        self.changed()
+        return results
+
+    def add(self, entry):
+        year = date_string_year(entry['date'])
+        if year in self.store.unloaded:
+            self.load_year(year)
+        self.insert(entry)
+        self.storage.add(entry)
+        return dict(entry)
+
+    def update(self, entry_id, changes):
+        for field, value in changes.items():
+            if field == 'date' and date_string_year(value) in self.store.unloaded:
+                self.load_year(date_string_year(value))
+            row = self.find_row(entry_id)
+            if value != self.store.value(row, field):
+                row = self.set_value(row, field, value)
+                self.storage.update(entry_id, field, value)
+        return self.store.entry(self.find_row(entry_id))
+
+    def delete(self, entry_id):
+        row = self.find_row(entry_id)
+        entry = self.store.entry(row)
+        self.remove(row)
+        self.storage.delete(entry_id)
+        return entry
+
+    def get(self, entry_id):
+        return self.store.entry(self.find_row(entry_id))
+
+    def query(self, text='', start=None, end=None, min_hours=None, max_hours=None, offset=0, limit=1000):
+        """Entries matching like the table's search and filters (in date order), and how many matched in all."""
+        self.load_years(start, end)
+        rows = self.store.search(text, start, end, min_hours, max_hours)
+        return {'count': len(rows), 'entries': [self.store.entry(int(row)) for row in rows[offset:offset + limit]]}
+
+    def totals(self, start=None, end=None):
+        """Hours, days and amount of all entries, or of the dates `start`..`end`, from the store's aggregates."""
+        if start is None and end is None:
+            hours, amount = self.store.total_hours, self.pay.amount(self.store)
+            count = len(self.store) + sum(summary['entries'] for summary in self.store.unloaded.values())
+        else:
+            start, end = start or datetime.min.date(), end or datetime.max.date()
+            self.load_years(start, end)
+            rows = self.store.rows_between(start, end)
+            hours, amount, count = self.store.hours_between(start, end), self.pay.amount(self.store, rows), len(rows)
+        return {'entries': count, 'hours': hours, 'days': hours / 8, 'amount': amount}
+
+
+class EntryService:
+    """
+    The HTTP side: parses requests on an asyncio loop and hands the work to the store's thread.
+
+    `dispatch(function)` runs a function on the thread that owns the store: the submit
+    of a single-worker executor when headless, a queued Qt signal in the app.
+    """
+
+    def __init__(self, collection, dispatch, token=''):
+        self.collection = collection
+        self.dispatch = dispatch
+        self.token = token
+        self.queue = []  # (operation, future) waiting for the next commit
+        self.wakeup = None
+        self.commit_task = None
+        self.totals_cache = {}  # (start, end) -> totals, until the next change
+        self.generation = 0  # counts changes, so totals computed across one are not cached
+        self.cache_lock = threading.Lock()  # invalidate may run on another thread than the loop
+        self.commits = 0
+        self.committed_writes = 0
+
+    async def start(self, host, port):
+        """Listen on `host`:`port`; returns the asyncio server."""
+        self.wakeup = asyncio.Event()
+        self.commit_task = asyncio.create_task(self.commit_loop())
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+    async def close(self):
+        # Writes still queued were never acknowledged, so dropping them breaks no promise
+        self.commit_task.cancel()
+
+    def invalidate(self):
+        """Forget the cached totals; also for changes made outside the service (called from any thread)."""
+        with self.cache_lock:
+            self.generation += 1
+            self.totals_cache = {}
+
+    async def call(self, function):
+        """Run `function` on the store's thread and return its result."""
+        future = Future()
+
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function())
+                except BaseException as e:
+                    future.set_exception(e)
+        self.dispatch(run)
+        return await asyncio.wrap_future(future)
+
+    async def write(self, operation):
+        """Queue `operation(collection)` for the next group commit and return its result once it is on disk."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append((operation, future))
+        self.wakeup.set()
+        return await future
+
+    async def commit_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            batch, self.queue = self.queue, []
+            try:
+                results = await self.call(lambda: self.collection.commit([operation for operation, _ in batch]))
+            except Exception as e:
+                results = [(None, e)] * len(batch)
+            self.invalidate()
+            self.commits += 1
+            self.committed_writes += len(batch)
+            for (_, future), (result, error) in zip(batch, results):
+                if future.done():  # the client went away
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    # HTTP
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    try:
+                        method, target, version = request_line.decode('latin-1').split()
+                        length = int(headers.get('content-length', 0))
+                    except ValueError:
+                        keep_alive = False
+                        raise RequestError(HTTPStatus.BAD_REQUEST, 'malformed request')
+                    keep_alive = keep_alive and version == 'HTTP/1.1'
+                    if length > MAX_BODY or length < 0:
+                        keep_alive = False
+                        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'request body too large')
+                    body = await reader.readexactly(length) if length else b''
+                    if self.token and headers.get('authorization') != f'Bearer {self.token}':
+                        raise RequestError(HTTPStatus.UNAUTHORIZED, 'missing or wrong token')
+                    status, payload = await self.route(method, target, body)
+                except RequestError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f'{type(e).__name__}: {e}'}
+
+                data = json.dumps(payload).encode('utf-8')
+                connection = '' if keep_alive else 'Connection: close\r\n'
+                head = (f'HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n'
+                        f'Content-Length: {len(data)}\r\n{connection}\r\n')
+                writer.write(head.encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        except asyncio.CancelledError:
+            # The service is stopping; the connection just goes away
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body):
+        """(status, payload) for one request."""
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, 'body is not valid JSON')
+
+        if parts == ['entries']:
+            if method == 'GET':
+                return HTTPStatus.OK, await self.call(lambda: self.collection.query(**self.query_filters(query)))
+            if method == 'POST':
+                if isinstance(data, list):
+                    entries = [validate_entry(item) for item in data]
+                    results = await asyncio.gather(*(self.write(lambda c, entry=entry: c.add(entry))
+                                                     for entry in entries))
+                    return HTTPStatus.CREATED, results
+                entry = validate_entry(data)
+                return HTTPStatus.CREATED, await self.write(lambda c: c.add(entry))
+        elif len(parts) == 2 and parts[0] == 'entries':
+            try:
+                entry_id = int(parts[1])
+            except ValueError:
+                raise RequestError(HTTPStatus.NOT_FOUND, f'no entry {parts[1]}')
+            try:
+                if method == 'GET':
+                    return HTTPStatus.OK, await self.call(lambda: self.collection.get(entry_id))
+                if method == 'PATCH':
+                    if not isinstance(data, dict) or not data or not set(data) <= set(FIELDS):
+                        raise RequestError(HTTPStatus.BAD_REQUEST, f'expected an object with some of {", ".join(FIELDS)}')
+                    changes = {field: validate_field(field, value) for field, value in data.items()}
+                    return HTTPStatus.OK, await self.write(lambda c: c.update(entry_id, changes))
+                if method == 'DELETE':
+                    return HTTPStatus.OK, await self.write(lambda c: c.delete(entry_id))
+            except KeyError:
+                raise RequestError(HTTPStatus.NOT_FOUND, f'no entry {entry_id}')
+        elif parts == ['totals']:
+            if method == 'GET':
+                start = parse_date(query['start'], 'start') if 'start' in query else None
+                end = parse_date(query['end'], 'end') if 'end' in query else None
+                totals = self.totals_cache.get((start, end))
+                if totals is None:
+                    generation = self.generation
+                    totals = await self.call(lambda: self.collection.totals(start, end))
+                    with self.cache_lock:
+                        if generation == self.generation:
+                            self.totals_cache[start, end] = totals
+                return HTTPStatus.OK, totals
+        elif parts == ['status']:
+            if method == 'GET':
+                totals = await self.call(self.collection.totals)
+                return HTTPStatus.OK, {'entries': totals['entries'], 'commits': self.commits,
+                                       'committed_writes': self.committed_writes}
+        else:
+            raise RequestError(HTTPStatus.NOT_FOUND, f'no such resource: {url.path}')
+        raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, f'{method} is not supported on {url.path}')
+
+    @staticmethod
+    def query_filters(query):
+        filters = {'text': query.get('text', '')}
+        for name in ('start', 'end'):
+            if name in query:
+                filters[name] = parse_date(query[name], name)
+        for name in ('min_hours', 'max_hours'):
+            if name in query:
+                filters[name] = parse_number(query[name], name)
+        for name, default in (('offset', 0), ('limit', 1000)):
+            try:
+                filters[name] = min(max(int(query.get(name, default)), 0), MAX_LIMIT if name == 'limit' else sys.maxsize)
+            except ValueError:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f'{name} must be an integer')
+        return filters
+
+
+class ServiceThread(threading.Thread):
+    """Runs an EntryService on an event loop of its own, e.g. next to the Qt window."""
+
+    def __init__(self, service, host=SERVICE_HOST, port=SERVICE_PORT):
+        super().__init__(name='entry-service', daemon=True)
+        self.service = service
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.stopping = None
+        self.ready = threading.Event()
+        self.error = None
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        try:
+            server = await self.service.start(self.host, self.port)
+        except OSError as e:
+            self.error = e
+            return
+        finally:
+            self.ready.set()
+        try:
+            await self.stopping.wait()
+        finally:
+            # Requests still waiting for the store's thread are cancelled rather than
+            # waited for, as that thread may be the one stopping the service
+            server.close()
+            await self.service.close()
+
+    def stop(self):
+        if self.loop is not None and self.is_alive():
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            self.join()
+
+
+def open_collection(data_dir, backend=None):
+    """Open the entries in `data_dir` like the app does: the current year in memory, earlier ones on disk."""
+    settings = read_settings(data_dir)
+    storage = open_entry_storage(data_dir, backend=backend)
+    entries, summaries, next_id = storage.load_recent()
+    store = EntryStore(entries)
+    store.set_unloaded(summaries, next_id)
+    storage.attach(store)
+    return EntryCollection(store, storage, PayEngine(float(settings.get('salary', 0)), settings.get('multiplier', 1.0)))
+
+
+async def serve_forever(service, host, port):
+    server = await service.start(host, port)
+    print(f'Serving entries on http://{host}:{port}', file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a profile\'s overtime entries over HTTP/JSON.')
+    parser.add_argument('--profile', help='profile to serve (default: the one open last)')
+    parser.add_argument('--host', default=SERVICE_HOST, help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='port to listen on (default: %(default)s)')
+    parser.add_argument('--token', default=SERVICE_TOKEN,
+                        help='require "Authorization: Bearer TOKEN" on every request (default: OVERTIME_SERVICE_TOKEN)')
+    parser.add_argument('--backend', choices=BACKENDS,
+                        help='storage backend of the data (default: as configured)')
+    args = parser.parse_args(argv)
+
+    profile = args.profile or read_active_profile()
+    if profile not in list_profiles():
+        print(f'No profile named {profile}', file=sys.stderr)
+        return 1
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='entry-store') as store_thread:
+        # SQLite connections only work on the thread that opened them, so the storage is
+        # opened, used and closed on the store's own thread
+        collection = store_thread.submit(open_collection, profile_dir(profile), args.backend).result()
+        try:
+            asyncio.run(serve_forever(EntryService(collection, store_thread.submit, args.token), args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            store_thread.submit(collection.storage.close).result()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1092 @@
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import date, datetime
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import traceback
+import zlib
+
+try:
+    import numpy
+except ImportError:  # optional; binary files load record by record without it
+    numpy = None
+
+from entries import EntryColumns, EntryStore, date_string_key, date_string_year
+from instrumentation import instrumented
+
+
+# Formats older versions of the app wrote, tried in order (day before month, as before)
+LEGACY_DATE_FORMATS = (
+    '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%d-%m-%Y %H:%M:%S',
+    '%d/%m/%Y', '%d.%m.%Y', '%Y/%m/%d', '%d %b %Y', '%d %B %Y', '%b %d %Y', '%B %d, %Y',
+)
+
+
+def parse_legacy_date(date_str):
+    for date_format in LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format)
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(date_str)
+    except ValueError:
+        return None
+
+
+def normalize_dates(entries):
+    """
+    Convert all dates to the DD-MM-YYYY format in one pass and return True if any changed.
+
+    Every date first gets the cheap DD-MM-YYYY parse; only the ones that fail it
+    go through the legacy formats. Dates that match nothing are left as they are.
+    """
+    changed = False
+    legacy = []
+    for entry in entries:
+        date_str = entry['date']
+        try:
+            parsed = datetime.strptime(date_str, '%d-%m-%Y')
+        except (TypeError, ValueError):
+            legacy.append(entry)
+            continue
+        if len(date_str) != 10:  # strptime also accepts unpadded days and months
+            entry['date'] = parsed.strftime('%d-%m-%Y')
+            changed = True
+
+    for entry in legacy:
+        parsed = parse_legacy_date(str(entry['date']))
+        if parsed is not None:
+            entry['date'] = parsed.strftime('%d-%m-%Y')
+            changed = True
+    return changed
+
+
+def date_to_ordinal(date_str):
+    return datetime.strptime(date_str, '%d-%m-%Y').toordinal()
+
+
+def ordinal_to_date(ordinal):
+    return date.fromordinal(ordinal).strftime('%d-%m-%Y')
+
+
+def assign_ids(entries):
+    """Give every entry a stable integer id and return the next free one."""
+    next_id = max((entry['id'] for entry in entries if 'id' in entry), default=-1) + 1
+    for entry in entries:
+        if 'id' not in entry:
+            entry['id'] = next_id
+            next_id += 1
+    return next_id
+
+
+def read_entries_file(path):
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            return json.load(file)
+    return []
+
+
+@instrumented('write_json')
+def write_json_atomic(path, data):
+    """Write JSON through a temp file and rename, so a crash never leaves a half-written file."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def write_entries_file(path, entries):
+    write_json_atomic(path, entries)
+    # Everything written here went through normalize_dates (or came from the app) already
+    mark_normalized(path)
+
+
+def normalized_stamp_path(path):
+    return path + '.normalized'
+
+
+def mark_normalized(path):
+    """Remember the size and mtime of a file whose dates are all DD-MM-YYYY."""
+    stat = os.stat(path)
+    with open(normalized_stamp_path(path), 'w') as file:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}, file)
+
+
+def is_marked_normalized(path):
+    try:
+        with open(normalized_stamp_path(path), 'r') as file:
+            stamp = json.load(file)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return False
+    return stamp == {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+@instrumented('read_json')
+def load_entries_file(path):
+    """
+    Read an entries file, normalizing its dates the first time it is seen.
+
+    The normalized result is written back once, and the stamp left by that write
+    lets later startups skip the normalization pass entirely.
+    """
+    entries = read_entries_file(path)
+    if entries and not is_marked_normalized(path):
+        if normalize_dates(entries):
+            write_entries_file(path, entries)
+        else:
+            mark_normalized(path)
+    return entries
+
+
+class PersistScheduler:
+    """
+    Coalesces rapid writes and runs them on a worker thread.
+
+    Each write is registered under a key and only the latest one per key is kept.
+    They all run once nothing new was scheduled for `delay` seconds, so typing a
+    salary or making a burst of edits ends in one write per file.
+    """
+
+    def __init__(self, delay=0.5):
+        self.delay = delay
+        self.pending = {}
+        self.deadline = None
+        self.busy = False
+        self.closing = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def schedule(self, key, write):
+        """Run `write()` on the worker once things go quiet, replacing any pending write for `key`."""
+        with self.condition:
+            self.pending[key] = write
+            self.deadline = time.monotonic() + self.delay
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending or time.monotonic() < self.deadline:
+                    if self.closing and not self.pending:
+                        return
+                    timeout = self.deadline - time.monotonic() if self.pending else None
+                    self.condition.wait(timeout)
+                writes, self.pending = list(self.pending.values()), {}
+                self.busy = True
+
+            for write in writes:
+                try:
+                    write()
+                except Exception:
+                    # A failed write must not stop later ones; the next change retries it
+                    traceback.print_exc()
+
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self):
+        """Run pending writes now and wait until they are on disk."""
+        with self.condition:
+            self.deadline = time.monotonic()
+            self.condition.notify_all()
+            while self.pending or self.busy:
+                self.condition.wait()
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+
+
+class EntryStorage:
+    """
+    What the app expects of a storage: load, load_recent, attach, save, add, add_many,
+    update, delete, reset, batch and close. The defaults below fit the storages that read
+    everything at once and write each change as it comes.
+    """
+
+    def load_recent(self):
+        """(entries, summaries, next id) like ShardedEntryStorage.load_recent; here every entry is read."""
+        return self.load(), {}, 0
+
+    def attach(self, store):
+        """Use `store` (an EntryStore) as the source of later writes; the default reads nothing from it."""
+
+    def save(self):
+        """Write out changes still held back; by default every change is already on disk."""
+
+
+class JsonEntryStorage(EntryStorage):
+    """
+    Keeps all entries in one JSON file and rewrites it on changes.
+
+    The file is written from a snapshot of the attached entry store. With a scheduler
+    the rewrites are debounced onto its worker thread, so a burst of edits costs one write.
+    """
+
+    def __init__(self, path, scheduler=None):
+        self.path = path
+        self.scheduler = scheduler
+        self.source = None
+        self.batching = False
+        self.save_pending = False
+
+    def load(self):
+        entries = load_entries_file(self.path)
+        assign_ids(entries)
+        return entries
+
+    def attach(self, store):
+        """Use `store` (an EntryStore) as the source of every rewrite."""
+        self.source = store
+
+    @contextmanager
+    def batch(self):
+        """Group commit: the changes made inside end in one rewrite."""
+        self.batching = True
+        try:
+            yield
+        finally:
+            self.batching = False
+            if self.save_pending:
+                self.save_pending = False
+                self.save()
+
+    def save(self):
+        if self.batching:
+            self.save_pending = True
+            return
+        # Copying the columns is cheap and keeps later changes out of the pending write
+        snapshot = self.source.snapshot()
+        write = lambda: write_entries_file(self.path, list(snapshot.iter_dicts()))
+        if self.scheduler is None:
+            write()
+        else:
+            self.scheduler.schedule(self.path, write)
+
+    def add(self, entry):
+        self.save()
+
+    def add_many(self, entries):
+        """Add a batch of entries with a single write; put them into the store before calling this."""
+        self.save()
+
+    def update(self, entry_id, field, value):
+        self.save()
+
+    def delete(self, entry_id):
+        self.save()
+
+    def reset(self):
+        self.save()
+
+    def close(self):
+        pass
+
+
+class JournalEntryStorage(EntryStorage):
+    """
+    Appends one JSON line per add/edit/delete to a journal next to the snapshot file.
+
+    Loading replays the journal over the last snapshot. Every `compact_every` records the
+    journal is sealed and a worker thread folds it into a new snapshot, so the cost of a
+    single edit never depends on how many entries exist.
+    """
+
+    def __init__(self, snapshot_path, journal_path, compact_every=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.sealed_path = journal_path + '.sealed'
+        self.compact_every = compact_every
+        self.journal = None
+        self.batch_records = None  # records held back until the end of a batch
+        self.records_since_compaction = 0
+        self.lock = threading.Lock()
+        self.compaction_thread = None
+
+    def load(self):
+        entries = load_entries_file(self.snapshot_path)
+        assign_ids(entries)
+        by_id = {entry['id']: entry for entry in entries}
+
+        # A sealed journal is left behind when the app stopped during a compaction
+        for path in (self.sealed_path, self.journal_path):
+            self.replay(path, by_id)
+
+        self.journal = open(self.journal_path, 'a')
+        if os.path.exists(self.sealed_path):
+            self.start_compaction()
+        return list(by_id.values())
+
+    @staticmethod
+    def replay(path, by_id):
+        """Apply the records in `path` to `by_id` (entries keyed by id)."""
+        if not os.path.exists(path):
+            return
+
+        with open(path, 'r') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append; everything before it is intact
+                    break
+                op = record['op']
+                if op == 'add':
+                    entry = record['entry']
+                    by_id[entry['id']] = entry
+                elif op == 'edit' and record['id'] in by_id:
+                    by_id[record['id']][record['field']] = record['value']
+                elif op == 'delete':
+                    by_id.pop(record['id'], None)
+                elif op == 'reset':
+                    by_id.clear()
+
+    @contextmanager
+    def batch(self):
+        """Group commit: the records of the changes made inside are appended with one write and one fsync."""
+        self.batch_records = []
+        try:
+            yield
+        finally:
+            records, self.batch_records = self.batch_records, None
+            if records:
+                self.append(*records)
+
+    def append(self, *records):
+        """Append records to the journal with one write and one fsync."""
+        if self.batch_records is not None:
+            self.batch_records.extend(records)
+            return
+        with self.lock:
+            self.journal.write(''.join(json.dumps(record) + '\n' for record in records))
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.records_since_compaction += len(records)
+        if self.records_since_compaction >= self.compact_every:
+            self.start_compaction()
+
+    def add(self, entry):
+        self.append({'op': 'add', 'entry': entry})
+
+    def add_many(self, entries):
+        self.append(*({'op': 'add', 'entry': entry} for entry in entries))
+
+    def update(self, entry_id, field, value):
+        self.append({'op': 'edit', 'id': entry_id, 'field': field, 'value': value})
+
+    def delete(self, entry_id):
+        self.append({'op': 'delete', 'id': entry_id})
+
+    def reset(self):
+        self.append({'op': 'reset'})
+
+    def start_compaction(self):
+        """Seal the active journal and fold it into a new snapshot on a worker thread."""
+        with self.lock:
+            if self.compaction_thread is not None and self.compaction_thread.is_alive():
+                return
+            if not os.path.exists(self.sealed_path):
+                self.journal.close()
+                os.replace(self.journal_path, self.sealed_path)
+                self.journal = open(self.journal_path, 'a')
+            self.records_since_compaction = 0
+            self.compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self.compaction_thread.start()
+
+    def compact(self):
+        # Works purely from files, so the GUI thread can keep appending meanwhile
+        entries = read_entries_file(self.snapshot_path)
+        assign_ids(entries)
+        by_id = {entry['id']: entry for entry in entries}
+        self.replay(self.sealed_path, by_id)
+        write_entries_file(self.snapshot_path, list(by_id.values()))
+        os.remove(self.sealed_path)
+
+    def close(self):
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+
+class SqliteEntryStorage(EntryStorage):
+    """
+    Keeps entries in an SQLite table indexed on the date ordinal.
+
+    Every add, edit and delete is a single-row statement. Entries whose date could not be
+    normalized keep ordinal 0 (sorting first, like in the entry store) and their date text.
+    The first time the database is opened it imports the existing JSON snapshot and journal.
+    """
+
+    def __init__(self, db_path, snapshot_path, journal_path):
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.connection = None
+        self.batching = False
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    ordinal INTEGER NOT NULL,
+                    hours REAL NOT NULL,
+                    task TEXT NOT NULL,
+                    multiplier REAL NOT NULL DEFAULT 0,
+                    date_text TEXT
+                );
+                CREATE INDEX IF NOT EXISTS entries_ordinal ON entries (ordinal);
+                """
+            )
+            version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+            if version == 0:
+                self.migrate_from_json()
+        return self.connection
+
+    @staticmethod
+    def date_columns(date_str):
+        """(ordinal, date_text) of a date: the ordinal alone, or 0 and the text when it is not DD-MM-YYYY."""
+        try:
+            return date_to_ordinal(date_str), None
+        except (TypeError, ValueError):
+            return 0, date_str
+
+    def migrate_from_json(self):
+        """One-shot import of overtime_data.json plus any journal records into the database."""
+        entries = load_entries_file(self.snapshot_path)
+        assign_ids(entries)
+        by_id = {entry['id']: entry for entry in entries}
+        for path in (self.journal_path + '.sealed', self.journal_path):
+            JournalEntryStorage.replay(path, by_id)
+
+        rows = [(entry_id, *self.date_columns(entry['date']), float(entry['hours']), entry['task'],
+                 float(entry.get('multiplier', 0.0))) for entry_id, entry in by_id.items()]
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO entries (id, ordinal, date_text, hours, task, multiplier) VALUES (?, ?, ?, ?, ?, ?)',
+                rows)
+            self.connection.execute('PRAGMA user_version = 1')
+
+    def load(self):
+        connection = self.connect()
+        dates = {}
+        entries = []
+        for entry_id, ordinal, date_text, hours, task, multiplier in connection.execute(
+                'SELECT id, ordinal, date_text, hours, task, multiplier FROM entries ORDER BY ordinal, id'):
+            # Only a few thousand distinct days exist, so format each of them once
+            if not ordinal:
+                date_str = date_text or ''
+            else:
+                date_str = dates.get(ordinal)
+                if date_str is None:
+                    date_str = dates[ordinal] = ordinal_to_date(ordinal)
+            entries.append({'hours': hours, 'date': date_str, 'task': task, 'multiplier': multiplier, 'id': entry_id})
+        return entries
+
+    @contextmanager
+    def batch(self):
+        """Group commit: the statements of the changes made inside share one transaction."""
+        self.batching = True
+        try:
+            yield
+        finally:
+            self.batching = False
+            self.connection.commit()
+
+    def transaction(self):
+        """The connection as a context that commits, or nothing while a batch holds the transaction open."""
+        return nullcontext() if self.batching else self.connection
+
+    def add(self, entry):
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        """Insert a batch of entries in one transaction."""
+        with self.transaction():
+            self.connection.executemany(
+                'INSERT INTO entries (id, ordinal, date_text, hours, task, multiplier) VALUES (?, ?, ?, ?, ?, ?)',
+                [(entry['id'], *self.date_columns(entry['date']), entry['hours'], entry['task'],
+                  entry.get('multiplier', 0.0)) for entry in entries]
+            )
+
+    def update(self, entry_id, field, value):
+        if field == 'date':
+            with self.transaction():
+                self.connection.execute('UPDATE entries SET ordinal = ?, date_text = ? WHERE id = ?',
+                                        (*self.date_columns(value), entry_id))
+            return
+        column = field if field in ('hours', 'multiplier') else 'task'
+        with self.transaction():
+            self.connection.execute(f'UPDATE entries SET {column} = ? WHERE id = ?', (value, entry_id))
+
+    def delete(self, entry_id):
+        with self.transaction():
+            self.connection.execute('DELETE FROM entries WHERE id = ?', (entry_id,))
+
+    def reset(self):
+        with self.transaction():
+            self.connection.execute('DELETE FROM entries')
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class BinaryEntryStorage(EntryStorage):
+    """
+    Keeps entries as fixed-width records in a memory-mapped file, with task texts in a string heap beside it.
+
+    A record's slot is its entry id, so an add, edit or delete rewrites just that record's
+    bytes in place; each distinct task text is appended to the heap once. Every record
+    carries a CRC32, and the header a dirty flag that is set while the file is open. After
+    a crash, load checks each record and drops (and counts in `torn_records`) those that
+    were only partly written.
+    """
+
+    MAGIC = b'OVTB'
+    VERSION = 1
+    # magic, version, flags, used slots, heap size, CRC32 of the fields before it
+    HEADER = struct.Struct('<4sHHqqI')
+    HEADER_SIZE = 64
+    # entry id (-1 for a free slot), date ordinal (0 if unparseable), hours, multiplier (0 for the default),
+    # heap offset, heap length, CRC32
+    RECORD = struct.Struct('<qiddIII')
+    RECORD_DTYPE = [('id', '<i8'), ('key', '<i4'), ('hours', '<f8'), ('multiplier', '<f8'), ('offset', '<u4'),
+                    ('length', '<u4'), ('crc', '<u4')]
+    DIRTY = 1
+    # An unparseable date is kept in the heap in front of its task, separated by a NUL
+    DATE_SEPARATOR = '\0'
+
+    def __init__(self, path, heap_path):
+        self.path = path
+        self.heap_path = heap_path
+        self.file = None
+        self.map = None
+        self.heap = None
+        self.slots = 0
+        self.heap_size = 0
+        self.heap_refs = {}   # text -> (offset, length)
+        self.heap_texts = {}  # offset -> text
+        self.was_dirty = False
+        self.torn_records = 0
+        self.batch_slots = None  # slots flushed at the end of a batch
+
+    def open(self):
+        if self.file is not None:
+            return
+        if not os.path.exists(self.path):
+            with open(self.path, 'wb') as file:
+                file.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, 0, 0, self.header_crc(0))
+                           .ljust(self.HEADER_SIZE, b'\0'))
+        self.file = open(self.path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, version, flags, self.slots, self.heap_size, crc = self.HEADER.unpack_from(self.map)
+        if magic != self.MAGIC or version != self.VERSION or crc != self.header_crc(flags):
+            self.map.close()
+            self.file.close()
+            self.file = self.map = None
+            raise ValueError(f'{self.path} is not an entry file this version can read')
+        self.was_dirty = bool(flags & self.DIRTY)
+        # A file cut short (a crash while it was written back) loses the slots past its end
+        if self.slots > self.capacity():
+            self.torn_records += self.slots - self.capacity()
+            self.slots = self.capacity()
+            self.was_dirty = True
+        self.write_header(self.DIRTY)
+
+        # Heap bytes past the recorded size come from an append that never completed
+        self.heap = open(self.heap_path, 'a+b')
+        if os.path.getsize(self.heap_path) != self.heap_size:
+            self.heap.truncate(self.heap_size)
+
+    def header_crc(self, flags):
+        return zlib.crc32(self.HEADER.pack(self.MAGIC, self.VERSION, flags, self.slots, self.heap_size, 0)[:-4])
+
+    def write_header(self, flags):
+        self.HEADER.pack_into(self.map, 0, self.MAGIC, self.VERSION, flags, self.slots, self.heap_size,
+                              self.header_crc(flags))
+        self.map.flush(0, self.HEADER_SIZE)
+
+    def capacity(self):
+        return (len(self.map) - self.HEADER_SIZE) // self.RECORD.size
+
+    def load(self):
+        """Entries as an EntryColumns, read from the mapped records without building dicts."""
+        self.open()
+        with open(self.heap_path, 'rb') as file:
+            heap = file.read(self.heap_size)
+
+        records = self.map[self.HEADER_SIZE:self.HEADER_SIZE + self.slots * self.RECORD.size]
+        if numpy is not None and not self.was_dirty:
+            return self.load_records_numpy(records, heap)
+
+        columns = EntryColumns()
+        codes = {}  # heap offset -> task code
+        torn_slots = []
+        record_size = self.RECORD.size
+        for slot, (entry_id, key, hours, multiplier, offset, length, crc) in enumerate(
+                self.RECORD.iter_unpack(records)):
+            if entry_id == -1:
+                continue
+            if self.was_dirty:
+                start = slot * record_size
+                if entry_id != slot or zlib.crc32(records[start:start + record_size - 4]) != crc:
+                    torn_slots.append(slot)
+                    continue
+
+            code = codes.get(offset)
+            if code is None:
+                text = heap[offset:offset + length].decode('utf-8')
+                self.heap_refs[text] = (offset, length)
+                self.heap_texts[offset] = text
+                if not key:
+                    text = text.partition(self.DATE_SEPARATOR)[2]
+                code = codes[offset] = len(columns.task_values)
+                columns.task_values.append(text)
+            if not key:
+                # An unparseable date rides in the heap string, in front of the task
+                columns.odd_dates[entry_id] = self.heap_texts[offset].partition(self.DATE_SEPARATOR)[0]
+            columns.ids.append(entry_id)
+            columns.keys.append(key)
+            columns.hours.append(hours)
+            columns.multipliers.append(multiplier)
+            columns.task_codes.append(code)
+
+        # Free the torn slots so the file is consistent again once it is closed cleanly
+        for slot in torn_slots:
+            self.write_record(slot, self.free_record())
+        self.sync(torn_slots)
+        self.torn_records += len(torn_slots)
+        return columns
+
+    def load_records_numpy(self, records, heap):
+        """load() for a cleanly closed file: whole columns at once, no per-record Python work."""
+        table = numpy.frombuffer(records, dtype=self.RECORD_DTYPE)
+        table = table[table['id'] != -1]
+        offsets, first_rows, codes = numpy.unique(table['offset'], return_index=True, return_inverse=True)
+
+        columns = EntryColumns()
+        columns.ids.frombytes(table['id'].tobytes())
+        columns.keys.frombytes(table['key'].tobytes())
+        columns.hours.frombytes(table['hours'].tobytes())
+        columns.multipliers.frombytes(table['multiplier'].tobytes())
+        columns.task_codes.frombytes(codes.astype(numpy.int32).tobytes())
+        for offset, row in zip(offsets.tolist(), first_rows.tolist()):
+            length = int(table['length'][row])
+            text = heap[offset:offset + length].decode('utf-8')
+            self.heap_refs[text] = (offset, length)
+            self.heap_texts[offset] = text
+            columns.task_values.append(text.partition(self.DATE_SEPARATOR)[2] if not table['key'][row] else text)
+        for row in numpy.flatnonzero(table['key'] == 0).tolist():
+            columns.odd_dates[columns.ids[row]] = self.heap_texts[int(table['offset'][row])].partition(
+                self.DATE_SEPARATOR)[0]
+        return columns
+
+    def record_fields(self, date_str, task):
+        """Date ordinal and heap text of an entry; an unparseable date goes into the heap text."""
+        key = date_string_key(date_str)
+        return (key, task) if key else (0, f'{date_str}{self.DATE_SEPARATOR}{task}')
+
+    def append_heap(self, texts):
+        """Append the texts that are not in the heap yet, with one write and one fsync."""
+        data = bytearray()
+        for text in texts:
+            if text not in self.heap_refs:
+                encoded = text.encode('utf-8')
+                offset = self.heap_size + len(data)
+                self.heap_refs[text] = (offset, len(encoded))
+                self.heap_texts[offset] = text
+                data += encoded
+        if data:
+            # Opened for appending and trimmed to heap_size, so this lands right after the counted bytes
+            self.heap.write(data)
+            self.heap.flush()
+            os.fsync(self.heap.fileno())
+            # Records only point at heap bytes the header already counts
+            self.heap_size += len(data)
+            self.write_header(self.DIRTY)
+
+    def pack_record(self, entry_id, key, hours, multiplier, text):
+        """Record bytes with their CRC; `text` is a heap text, or its (offset, length)."""
+        offset, length = self.heap_refs[text] if isinstance(text, str) else text
+        data = self.RECORD.pack(entry_id, key, float(hours), float(multiplier), offset, length, 0)[:-4]
+        return data + struct.pack('<I', zlib.crc32(data))
+
+    def read_record(self, entry_id):
+        """(date, hours, task, multiplier) of the entry in slot `entry_id`."""
+        _, key, hours, multiplier, offset, _, _ = self.RECORD.unpack_from(self.map, self.slot_offset(entry_id))
+        task = self.heap_texts[offset]
+        if not key:
+            date_str, _, task = task.partition(self.DATE_SEPARATOR)
+            return date_str, hours, task, multiplier
+        return ordinal_to_date(key), hours, task, multiplier
+
+    def slot_offset(self, slot):
+        return self.HEADER_SIZE + slot * self.RECORD.size
+
+    def ensure_slot(self, slot):
+        """Grow the file (by doubling) and the used slots so that `slot` exists; new slots are free."""
+        if slot < self.slots:
+            return
+        if slot >= self.capacity():
+            capacity = max(slot + 1, 2 * self.capacity(), 1024)
+            self.map.close()
+            self.file.truncate(self.slot_offset(capacity))
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        new_slots = slot + 1 - self.slots
+        self.map[self.slot_offset(self.slots):self.slot_offset(slot + 1)] = self.free_record() * new_slots
+        self.slots = slot + 1
+        self.write_header(self.DIRTY)
+
+    def free_record(self):
+        data = self.RECORD.pack(-1, 0, 0.0, 0.0, 0, 0, 0)[:-4]
+        return data + struct.pack('<I', zlib.crc32(data))
+
+    def write_record(self, slot, data):
+        offset = self.slot_offset(slot)
+        self.map[offset:offset + len(data)] = data
+
+    @contextmanager
+    def batch(self):
+        """Group commit: the records changed inside are flushed together at the end."""
+        self.batch_slots = set()
+        try:
+            yield
+        finally:
+            slots, self.batch_slots = self.batch_slots, None
+            if slots:
+                self.sync(slots)
+
+    def sync(self, slots):
+        """Flush the pages holding the given slots."""
+        if self.batch_slots is not None:
+            self.batch_slots.update(slots)
+            return
+        pages = {self.slot_offset(slot) // mmap.ALLOCATIONGRANULARITY for slot in slots}
+        if len(pages) > 64:
+            self.map.flush()
+            return
+        for page in pages:
+            start = page * mmap.ALLOCATIONGRANULARITY
+            self.map.flush(start, min(mmap.ALLOCATIONGRANULARITY * 2, len(self.map) - start))
+
+    def add(self, entry):
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        """Write a batch of entries; the heap and the header are each written once."""
+        if not entries:
+            return
+        fields = [self.record_fields(entry['date'], entry['task']) for entry in entries]
+        self.append_heap(text for _, text in fields)
+        self.ensure_slot(max(entry['id'] for entry in entries))
+        for entry, (key, text) in zip(entries, fields):
+            self.write_record(entry['id'], self.pack_record(entry['id'], key, entry['hours'],
+                                                            entry.get('multiplier', 0.0), text))
+        self.sync(entry['id'] for entry in entries)
+
+    def update(self, entry_id, field, value):
+        date_str, hours, task, multiplier = self.read_record(entry_id)
+        if field == 'date':
+            date_str = value
+        elif field == 'hours':
+            hours = value
+        elif field == 'multiplier':
+            multiplier = value
+        else:
+            task = value
+        key, text = self.record_fields(date_str, task)
+        self.append_heap([text])
+        self.write_record(entry_id, self.pack_record(entry_id, key, hours, multiplier, text))
+        self.sync([entry_id])
+
+    def delete(self, entry_id):
+        self.write_record(entry_id, self.free_record())
+        self.sync([entry_id])
+
+    def reset(self):
+        self.slots = self.heap_size = 0
+        self.heap_refs.clear()
+        self.heap_texts.clear()
+        self.heap.truncate(0)
+        self.write_header(self.DIRTY)
+
+    def close(self):
+        if self.file is None:
+            return
+        self.map.flush()
+        os.fsync(self.file.fileno())
+        # A clean close lets the next load skip the CRC checks
+        self.write_header(0)
+        self.map.close()
+        self.file.close()
+        self.heap.close()
+        self.file = self.map = self.heap = None
+
+
+
+class ShardSource:
+    """The attached store as one year's storage sees it: snapshot() holds only that year's rows."""
+
+    def __init__(self, store, year):
+        self.store = store
+        self.year = year
+
+    def snapshot(self):
+        return self.store.copy_rows(self.store.year_rows(self.year))
+
+
+class ShardedEntryStorage(EntryStorage):
+    """
+    Keeps each year of entries in its own folder under `years/`, written by one of the storages above.
+
+    Opening a profile only reads the current and later years (and the undated entries, in
+    `years/undated`); earlier years are read by load_year when they are needed.
+    `years/manifest.json` holds every year's entry count, hours and month sums (see
+    EntryStore.year_summary) and the next free id, so the totals cover the years that stay
+    on disk. Entries a folder kept in one storage before are split into years the first
+    time it is opened; the old files are left as they were. A manifest that is missing or
+    damaged while year folders exist is rebuilt from them.
+    """
+
+    YEARS_DIR = 'years'
+    MANIFEST_FILE = 'manifest.json'
+    UNDATED_DIR = 'undated'
+
+    def __init__(self, data_dir, open_shard, legacy_paths=(), scheduler=None):
+        self.data_dir = data_dir
+        self.years_dir = os.path.join(data_dir, self.YEARS_DIR)
+        self.manifest_path = os.path.join(self.years_dir, self.MANIFEST_FILE)
+        self.open_shard = open_shard  # folder -> storage for the entries in it
+        self.legacy_paths = legacy_paths
+        self.scheduler = scheduler
+        self.manifest = None
+        self.shards = {}  # year -> storage of a year that was loaded
+        self.id_years = {}  # entry id -> year, for the entries of the loaded years
+        self.source = None
+        self.batch_stack = None  # the open batches of the years' storages
+        self.batch_years = None  # years changed during a batch
+
+    def shard_dir(self, year):
+        return os.path.join(self.years_dir, str(year) if year else self.UNDATED_DIR)
+
+    def read_manifest(self):
+        if self.manifest is None:
+            try:
+                with open(self.manifest_path, 'r') as file:
+                    manifest = json.load(file)
+                self.manifest = {'next_id': int(manifest['next_id']),
+                                 'years': {int(year): summary for year, summary in manifest['years'].items()}}
+            except FileNotFoundError:
+                if self.year_dirs():
+                    self.rebuild_manifest()
+                else:
+                    self.manifest = {'next_id': 0, 'years': {}}
+                    self.split_legacy_entries()
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # Cut short or damaged; the year folders hold the entries themselves
+                self.rebuild_manifest()
+        return self.manifest
+
+    def year_dirs(self):
+        """{year: folder} of the year folders on disk (0: the undated entries)."""
+        if not os.path.isdir(self.years_dir):
+            return {}
+        folders = {}
+        for name in os.listdir(self.years_dir):
+            if name == self.UNDATED_DIR or name.isdigit():
+                folders[int(name) if name.isdigit() else 0] = os.path.join(self.years_dir, name)
+        return folders
+
+    def rebuild_manifest(self):
+        """Read every year folder once to count its entries into a new manifest, and write it."""
+        self.manifest = {'next_id': 0, 'years': {}}
+        for year, folder in self.year_dirs().items():
+            shard = self.open_shard(folder)
+            try:
+                store = EntryStore(shard.load())
+            finally:
+                shard.close()
+            if len(store):
+                self.manifest['years'][year] = store.year_summary(year)
+            self.manifest['next_id'] = max(self.manifest['next_id'], store.next_id)
+        self.write_manifest()
+
+    def write_manifest(self):
+        # Written right away, never through the scheduler: it is the only list of the years and of the
+        # next free id, so an entry committed to a year it does not list yet would be lost (and its id reused)
+        os.makedirs(self.years_dir, exist_ok=True)
+        write_json_atomic(self.manifest_path, {'next_id': self.manifest['next_id'],
+                                               'years': dict(self.manifest['years'])})
+
+    def split_legacy_entries(self):
+        """One-shot move of the entries kept in `data_dir` itself into one storage per year."""
+        if not any(os.path.exists(path) for path in self.legacy_paths):
+            return
+        legacy = self.open_shard(self.data_dir)
+        try:
+            store = EntryStore(legacy.load())
+        finally:
+            legacy.close()
+        if not len(store):
+            return
+
+        self.source = store
+        self.add_many(list(store.iter_dicts()))
+        for shard in self.shards.values():
+            shard.close()
+        if self.scheduler is not None:
+            # JSON shards are written by the scheduler; have them on disk before anything reopens them
+            self.scheduler.flush()
+        self.shards.clear()
+        self.id_years.clear()
+        self.source = None
+
+    def load(self):
+        """All entries, year by year."""
+        entries = []
+        for year in sorted(self.read_manifest()['years']):
+            entries.extend(self.load_year(year))
+        return entries
+
+    def load_recent(self):
+        """
+        (entries, summaries, next id): the entries of the current and later years and the
+        undated ones, {year: summary} of the earlier years, and the next id free in all years.
+        """
+        manifest = self.read_manifest()
+        current = date.today().year
+        entries = []
+        summaries = {}
+        for year, summary in sorted(manifest['years'].items()):
+            if year and year < current:
+                summaries[year] = summary
+            else:
+                entries.extend(self.load_year(year))
+        return entries, summaries, manifest['next_id']
+
+    @instrumented('read_year')
+    def load_year(self, year):
+        """Entries of one year (0: the undated ones); its storage stays open for the changes that follow."""
+        os.makedirs(self.shard_dir(year), exist_ok=True)
+        shard = self.open_shard(self.shard_dir(year))
+        entries = shard.load()
+        if self.source is not None:
+            shard.attach(ShardSource(self.source, year))
+        if self.batch_stack is not None:
+            self.batch_stack.enter_context(shard.batch())
+        self.shards[year] = shard
+        ids = entries.ids if isinstance(entries, EntryColumns) else (entry['id'] for entry in entries)
+        self.id_years.update(dict.fromkeys(ids, year))
+        return entries
+
+    def shard(self, year):
+        """Storage of one year, loaded first if it has not been."""
+        if year not in self.shards:
+            self.load_year(year)
+        return self.shards[year]
+
+    def attach(self, store):
+        """Use `store` (an EntryStore) for the JSON rewrites of each year and for the manifest."""
+        self.source = store
+        for year, shard in self.shards.items():
+            shard.attach(ShardSource(store, year))
+
+    @contextmanager
+    def batch(self):
+        """Group commit: each year's storage commits its part of the changes made inside once, then the manifest."""
+        self.batch_years = set()
+        try:
+            with ExitStack() as self.batch_stack:
+                for shard in self.shards.values():
+                    self.batch_stack.enter_context(shard.batch())
+                yield
+        finally:
+            self.batch_stack = None
+            years, self.batch_years = self.batch_years, None
+            if years:
+                self.changed(*years)
+
+    def changed(self, *years):
+        """Take the summaries of `years` from the attached store into the manifest and write it."""
+        if self.batch_years is not None:
+            self.batch_years.update(years)
+            return
+        manifest = self.read_manifest()
+        for year in years:
+            summary = self.source.year_summary(year)
+            if summary['entries']:
+                manifest['years'][year] = summary
+            else:
+                manifest['years'].pop(year, None)
+        manifest['next_id'] = max(manifest['next_id'], self.source.next_id)
+        self.write_manifest()
+
+    def save(self):
+        for shard in self.shards.values():
+            shard.save()
+
+    def add(self, entry):
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        """Add a batch of entries with one write per year; put them into the store before calling this."""
+        years = {}
+        for entry in entries:
+            years.setdefault(date_string_year(entry['date']), []).append(entry)
+        for year, year_entries in years.items():
+            self.shard(year).add_many(year_entries)
+            self.id_years.update(dict.fromkeys((entry['id'] for entry in year_entries), year))
+        self.changed(*years)
+
+    def update(self, entry_id, field, value):
+        year = self.id_years[entry_id]
+        new_year = date_string_year(value) if field == 'date' else year
+        if new_year == year:
+            self.shard(year).update(entry_id, field, value)
+            self.changed(year)
+            return
+        # A date in another year moves the entry into that year's storage
+        self.shard(year).delete(entry_id)
+        self.shard(new_year).add(self.source.entry(self.source.row_of(entry_id, value)))
+        self.id_years[entry_id] = new_year
+        self.changed(year, new_year)
+
+    def delete(self, entry_id):
+        year = self.id_years.pop(entry_id)
+        self.shard(year).delete(entry_id)
+        self.changed(year)
+
+    def reset(self):
+        years = set(self.read_manifest()['years']) | set(self.shards)
+        for year in years:
+            self.shard(year).reset()
+        self.id_years.clear()
+        self.changed(*years)
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        self.shards.clear()
+        self.id_years.clear()
@@ -0,0 +1,146 @@
+"""Entries written before a crash survive it: run with `python -m pytest -q`."""
+import os
+
+from entries import EntryStore
+from storage import (
+    BinaryEntryStorage, JournalEntryStorage, PersistScheduler, ShardedEntryStorage, read_entries_file
+)
+
+
+def make_entries(count, first_id=0):
+    return [{'id': i, 'date': '03-02-2024', 'hours': 1.0 + i, 'task': f'Task {i}'}
+            for i in range(first_id, first_id + count)]
+
+
+def crash(storage):
+    """Drop the binary storage's handles without the clean close, as a killed process would."""
+    storage.map.flush()
+    storage.map.close()
+    storage.file.close()
+    storage.heap.close()
+
+
+def test_binary_file_cut_mid_record_keeps_earlier_entries(tmp_path):
+    path, heap_path = str(tmp_path / 'entries.bin'), str(tmp_path / 'entries.heap')
+    storage = BinaryEntryStorage(path, heap_path)
+    storage.load()
+    storage.add_many(make_entries(5))
+    cut = storage.slot_offset(4) + storage.RECORD.size // 2
+    crash(storage)
+    os.truncate(path, cut)
+
+    storage = BinaryEntryStorage(path, heap_path)
+    columns = storage.load()
+    assert list(columns.ids) == [0, 1, 2, 3]
+    assert list(columns.hours) == [1.0, 2.0, 3.0, 4.0]
+    assert storage.torn_records == 1
+
+    # The recovered file takes new entries and closes cleanly
+    storage.add_many(make_entries(2, first_id=4))
+    storage.close()
+    storage = BinaryEntryStorage(path, heap_path)
+    assert list(storage.load().ids) == [0, 1, 2, 3, 4, 5]
+    assert storage.torn_records == 0
+    storage.close()
+
+
+def test_binary_torn_record_is_dropped(tmp_path):
+    path, heap_path = str(tmp_path / 'entries.bin'), str(tmp_path / 'entries.heap')
+    storage = BinaryEntryStorage(path, heap_path)
+    storage.load()
+    storage.add_many(make_entries(3))
+    offset = storage.slot_offset(2) + 12
+    storage.map[offset:offset + 4] = b'\xff\xff\xff\xff'
+    crash(storage)
+
+    storage = BinaryEntryStorage(path, heap_path)
+    assert list(storage.load().ids) == [0, 1]
+    assert storage.torn_records == 1
+    storage.close()
+
+
+def test_journal_torn_last_line_keeps_earlier_records(tmp_path):
+    snapshot_path, journal_path = str(tmp_path / 'entries.json'), str(tmp_path / 'journal.jsonl')
+    storage = JournalEntryStorage(snapshot_path, journal_path)
+    storage.load()
+    storage.add_many(make_entries(3))
+    storage.update(1, 'hours', 7.5)
+    storage.close()
+    with open(journal_path, 'a') as file:
+        file.write('{"op": "add", "entry": {"id": 3, "da')
+
+    storage = JournalEntryStorage(snapshot_path, journal_path)
+    entries = sorted(storage.load(), key=lambda entry: entry['id'])
+    storage.close()
+    assert [entry['id'] for entry in entries] == [0, 1, 2]
+    assert entries[1]['hours'] == 7.5
+
+
+def test_journal_compaction_folds_records_into_snapshot(tmp_path):
+    snapshot_path, journal_path = str(tmp_path / 'entries.json'), str(tmp_path / 'journal.jsonl')
+    storage = JournalEntryStorage(snapshot_path, journal_path, compact_every=4)
+    storage.load()
+    for entry in make_entries(4):
+        storage.add(entry)
+    storage.add(make_entries(1, first_id=4)[0])
+    storage.delete(0)
+    storage.close()
+
+    assert not os.path.exists(journal_path + '.sealed')
+    assert sorted(entry['id'] for entry in read_entries_file(snapshot_path)) == [0, 1, 2, 3]
+    storage = JournalEntryStorage(snapshot_path, journal_path)
+    assert sorted(entry['id'] for entry in storage.load()) == [1, 2, 3, 4]
+    storage.close()
+
+
+def test_journal_sealed_by_interrupted_compaction_is_replayed(tmp_path):
+    snapshot_path, journal_path = str(tmp_path / 'entries.json'), str(tmp_path / 'journal.jsonl')
+    storage = JournalEntryStorage(snapshot_path, journal_path)
+    storage.load()
+    storage.add_many(make_entries(2))
+    storage.close()
+    # The app stopped after sealing the journal, before the snapshot was written
+    os.replace(journal_path, journal_path + '.sealed')
+    storage = JournalEntryStorage(snapshot_path, journal_path)
+    storage.load()
+    storage.add(make_entries(1, first_id=2)[0])
+    storage.close()
+
+    storage = JournalEntryStorage(snapshot_path, journal_path)
+    entries = storage.load()
+    storage.close()
+    assert sorted(entry['id'] for entry in entries) == [0, 1, 2]
+    assert not os.path.exists(journal_path + '.sealed')
+    assert sorted(entry['id'] for entry in read_entries_file(snapshot_path)) == [0, 1]
+
+
+def open_sharded(data_dir, scheduler=None):
+    return ShardedEntryStorage(data_dir, lambda folder: JournalEntryStorage(
+        os.path.join(folder, 'entries.json'), os.path.join(folder, 'journal.jsonl')), scheduler=scheduler)
+
+
+def test_sharded_entry_in_new_year_survives_crash(tmp_path):
+    data_dir = str(tmp_path)
+    storage = open_sharded(data_dir)
+    storage.attach(EntryStore())
+    storage.load()
+    storage.source.add(make_entries(1)[0])
+    storage.add(storage.source.entry(0))
+    storage.close()
+
+    # The app's scheduler would hold debounced writes for a long while; the process dies before it runs
+    scheduler = PersistScheduler(delay=3600)
+    storage = open_sharded(data_dir, scheduler)
+    store = EntryStore(storage.load())
+    storage.attach(store)
+    entry = {'hours': 2.5, 'date': '05-03-2019', 'task': 'Old year'}
+    store.add(entry)
+    storage.add(entry)
+    for shard in storage.shards.values():
+        shard.journal.close()
+
+    storage = open_sharded(data_dir)
+    entries = storage.load()
+    storage.close()
+    assert sorted((entry['id'], entry['date']) for entry in entries) == [(0, '03-02-2024'), (1, '05-03-2019')]
+    assert storage.read_manifest()['next_id'] == 2